@@ -1,81 +1,92 @@
 import streamlit as st
-from selenium.webdriver.firefox.service import Service as FirefoxService
-from webdriver_manager.firefox import GeckoDriverManager
+import uuid
 import pandas as pd
-from selenium import webdriver
-from selenium.webdriver.firefox.options import Options
-from selenium.webdriver.common.by import By
-from selenium.common.exceptions import NoSuchElementException
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import time
-from tqdm import tqdm
-import io
-import re
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.utils import formataddr
-from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from email import encoders
+from job_queue import JobQueue, run_id_for_key, DONE
+from worker import save_upload, SENT_LOG_FILE
+from ui import get_worker, get_frame_cache, show_job, show_errors, show_job_errors, LIVE_ROWS
+from exporters import available_formats, export_frames, MIME_TYPES
+from classify import classify_contacts, language_counts, normalize_emails
+from ingest import iter_chunks, frame_to_csv_bytes
+
+
+def scraped_frame(rows):
+    # Emails normalized and qualifications classified in one pass over the whole result
+    frame = pd.DataFrame(rows)
+    return classify_contacts(frame) if not frame.empty else frame
+
+
+def partial_results_csv(run_id):
+    # Everything a running scrape has finished so far, built when the download is clicked
+    queue = JobQueue()
+    try:
+        rows = queue.results(run_id)
+    finally:
+        queue.close()
+    return pd.DataFrame(rows).to_csv(index=False).encode("utf-8")
+
+
+def show_partial(job, file_name):
+    # Latest rows, failures and a download of what is done, while a search or scrape job runs
+    queue = JobQueue()
+    try:
+        rows = queue.latest_results(job["run_id"], LIVE_ROWS)
+    finally:
+        queue.close()
+    if rows:
+        st.dataframe(pd.DataFrame(rows), hide_index=True)
+        st.download_button(
+            label="Download rows so far (CSV)",
+            data=lambda: partial_results_csv(job["run_id"]),
+            file_name=file_name,
+            mime="text/csv",
+            on_click="ignore",
+            key=f"partial-{job['job_id']}",
+        )
+    show_job_errors(job)
+
 
 # Page 1
 def page_1():
-    # Job Scraper Code for Page 1
-    def run_scraper(url):
-        options = Options()
-        options.headless = True  # Set headless mode to True
-        driver = webdriver.Firefox(options=options)
-        try:
-            driver.get(url)
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            click_count = 0
-            while True:
-                try:
-                    morepage_div = driver.find_element(By.ID, "morepage")
-                    button = morepage_div.find_element(By.TAG_NAME, "button")
-                    button.click()
-                    click_count += 1
-                    status_text.text(f"Loaded {click_count} more pages...")
-                    progress_bar.progress(click_count / (click_count + 8))
-                    time.sleep(3)
-                except NoSuchElementException:
-                    break
-            status_text.text("Extracting job information...")
-            data = []
-            articles = driver.find_elements(By.TAG_NAME, "article")
-            for article in articles:
-                spans = article.find_elements(By.CLASS_NAME, "noctitle")
-                for span in spans:
-                    title = span.text
-                    links = article.find_elements(By.TAG_NAME, "a")
-                    for link in links:
-                        href = link.get_attribute("href")
-                        if href and "https://www.jobbank.gc.ca/login" not in href:
-                            data.append({"Title": title, "Link": href})
-            df = pd.DataFrame(data)
-            return df
-        finally:
-            driver.quit()
-
     st.title('Job Scraper 🇨🇦 👨🏻‍💻')
     url = st.text_input('Enter the Job Bank search URL:', '')
+    engine = st.radio("Engine", ["Browser (click to load)", "Fast (direct HTTP)"], horizontal=True)
+    # Frequent polling only needs what was posted since the last run of the same search
+    incremental = st.checkbox("New postings only", value=False)
+    # CSV and Parquet are written much faster than Excel on large results
+    formats = available_formats()
+    export_format = st.selectbox("Download format", formats, index=formats.index("xlsx"))
     if st.button('Start Scraping'):
-        with st.spinner('Scraping in progress...'):
-            df = run_scraper(url)
-            st.write(f"Total jobs scraped: {len(df)}")
-            st.dataframe(df)
-            buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False)
-            st.download_button(
-                label="Download Excel file",
-                data=buffer,
-                file_name="job_Links.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
+        # Every click is a new search, there is nothing to resume
+        st.session_state.search_job = get_worker().submit("search", f"search-{uuid.uuid4().hex[:16]}", {
+            "url": url,
+            "engine": "browser" if engine == "Browser (click to load)" else "http",
+            "incremental": incremental,
+        })
+
+    job = None
+    if st.session_state.get("search_job"):
+        job = show_job(st.session_state.search_job, on_poll=lambda job: show_partial(job, "job_Links_partial.csv"))
+    if job is not None and job["state"] == DONE:
+        frames = get_frame_cache()
+
+        def build_frame():
+            queue = JobQueue()
+            try:
+                return pd.DataFrame(queue.results(job["run_id"]))
+            finally:
+                queue.close()
+
+        df = frames.get_or_build(("search", job["job_id"]), build_frame)
+        if len(df) > LIVE_ROWS:
+            st.write(f"The latest {LIVE_ROWS} rows, download the file for all of them:")
+        st.dataframe(df.tail(LIVE_ROWS), hide_index=True)
+        st.download_button(
+            label=f"Download {export_format.upper()} file",
+            data=frames.get_or_build(("search-export", job["job_id"], export_format),
+                                     lambda: export_frames(df, export_format)),
+            file_name=f"job_Links.{export_format}",
+            mime=MIME_TYPES[export_format]
+        )
 
 # Page 2
 # Page title
@@ -88,177 +99,107 @@ def page_2():
 
     # Initialize variables
     file_valid = False
-    df = None
 
     if uploaded_file is not None:
-        # Determine file type and read accordingly
-        file_type = uploaded_file.name.split('.')[-1]
-
         try:
-            if file_type == "xlsx":
-                df = pd.read_excel(uploaded_file)
-            elif file_type == "csv":
-                df = pd.read_csv(uploaded_file)
-            elif file_type == "txt":
-                df = pd.read_csv(uploaded_file, delimiter="\t")
+            # Parsed once per file content, reruns and pagination reuse the cached frame
+            frames = get_frame_cache()
+            required_headers = {"Title", "Link"}
+            actual_headers = set(frames.columns(uploaded_file))
+
+            if not required_headers.issubset(actual_headers):
+                st.error(f"File must have the following headers: {', '.join(required_headers)}")
             else:
-                st.error("Unsupported file type.")
-                df = None
-
-            if df is not None:
-                # Check if the DataFrame has the required headers
-                required_headers = {"Title", "Link"}
-                actual_headers = set(df.columns)
-
-                if not required_headers.issubset(actual_headers):
-                    st.error(f"File must have the following headers: {', '.join(required_headers)}")
-                else:
-                    file_valid = True
-                    st.write("File content:")
-
-                    # Define page size and initialize session state for pagination
-                    PAGE_SIZE = 10
-                    if 'page' not in st.session_state:
-                        st.session_state.page = 0
-
-                    # Calculate total pages
-                    total_pages = (len(df) // PAGE_SIZE) + (1 if len(df) % PAGE_SIZE > 0 else 0)
-                    
-                    # Display the current page of data
-                    start_row = st.session_state.page * PAGE_SIZE
-                    end_row = start_row + PAGE_SIZE
-                    st.dataframe(df.iloc[start_row:end_row])
-
-                    # Navigation buttons
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        if st.session_state.page > 0:
-                            if st.button("Previous", key="prev"):
-                                st.session_state.page -= 1
-                        
-                    with col2:
-                        if st.session_state.page < total_pages - 1:
-                            if st.button("Next", key="next"):
-                                st.session_state.page += 1
+                file_valid = True
+                total_rows = frames.row_count(uploaded_file)
+                st.write("File content:")
+
+                # Define page size and initialize session state for pagination
+                PAGE_SIZE = 10
+                if 'page' not in st.session_state:
+                    st.session_state.page = 0
+
+                # Calculate total pages
+                total_pages = (total_rows // PAGE_SIZE) + (1 if total_rows % PAGE_SIZE > 0 else 0)
+
+                # Display the current page of data
+                start_row = st.session_state.page * PAGE_SIZE
+                end_row = start_row + PAGE_SIZE
+                st.dataframe(frames.rows(uploaded_file, start_row, end_row))
+
+                # Navigation buttons
+                col1, col2 = st.columns(2)
+
+                with col1:
+                    if st.session_state.page > 0:
+                        if st.button("Previous", key="prev"):
+                            st.session_state.page -= 1
+
+                with col2:
+                    if st.session_state.page < total_pages - 1:
+                        if st.button("Next", key="next"):
+                            st.session_state.page += 1
 
         except Exception as e:
             st.error(f"An error occurred: {e}")
 
     # Show the "Scrap Mails" button only if the file is valid
     if file_valid:
+        # Number of Firefox sessions scraping in parallel
+        num_workers = st.number_input("Parallel browsers", min_value=1, max_value=8, value=4)
+        use_cache = st.checkbox("Reuse postings scraped in the last 24 hours instead of fetching them", value=True)
+        skip_seen = st.checkbox("Leave out postings scraped in earlier runs", value=True,
+                                help="Postings still in the 24 hour cache are kept, and a run started over keeps everything.")
+        resume = st.checkbox("Resume the previous run of this file", value=True)
+        formats = available_formats()
+        export_format = st.selectbox("Download format", formats, index=formats.index("xlsx"))
+
         if st.button("Scrap Mails"):
-            scraped_data = []
-            num_links = len(df)
-            progress_bar = st.progress(0)
-
-            # Initialize progress text
-            progress_text = st.empty()
-            
-            # Set up Firefox options for headless mode
-            firefox_options = Options()
-            firefox_options.add_argument("--headless")
-            
-            # Initialize Selenium WebDriver with Firefox in headless mode
-            driver = webdriver.Firefox(options=firefox_options)
-            
-            for index, row in df.iterrows():
-                link = row['Link']
-                title = row['Title']
-
-                try:
-                    driver.get(link)
-                    
-                    # Find qualification
-                    qualification_elem = driver.find_element(By.XPATH, "//p[@property='qualification']")
-                    qualification = qualification_elem.text if qualification_elem else "No qualification found"
-
-                    # Find and click the apply button
-                    try:
-                        apply_button = WebDriverWait(driver, 10).until(
-                            EC.element_to_be_clickable((By.ID, "applynowbutton"))
-                        )
-                        apply_button.click()
-                        time.sleep(2)  # Wait for 2 seconds
-                    except Exception as e:
-                        st.warning(f"Could not click apply button for {link}: {e}")
-
-                    # Find the how to apply div and extract email
-                    try:
-                        how_to_apply_div = driver.find_element(By.ID, "howtoapply")
-                        div_text = how_to_apply_div.text
-                        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-                        emails = re.findall(email_pattern, div_text)
-                        email = emails[0] if emails else "No email found"
-                    except Exception as e:
-                        email = f"Error finding email: {e}"
-
-                    scraped_data.append({
-                        'Title': title,
-                        'Link': link,
-                        'Qualification': qualification,
-                        'Email': email
-                    })
-                    
-                except Exception as e:
-                    st.error(f"Error scraping {link}: {e}")
-
-                # Update progress bar and text
-                progress = (index + 1) / num_links
-                progress_bar.progress(progress)
-                progress_text.text(f"Progress: {index + 1}/{num_links} ({progress * 100:.1f}%)")
-            
-            driver.quit()  # Close the browser
-
-            # Save the scraped data to an Excel file
-            if scraped_data:
-                df_scraped = pd.DataFrame(scraped_data)
-                output = io.BytesIO()
-                with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                    df_scraped.to_excel(writer, index=False, sheet_name='Scraped Data')
+            # Per-link state survives a dropped session, the same file picks up where it stopped
+            st.session_state.scrape_job = get_worker().submit("scrape", run_id_for_key("scrape", frames.key(uploaded_file)), {
+                "path": save_upload(uploaded_file),
+                "workers": num_workers,
+                "use_cache": use_cache,
+                "skip_seen": skip_seen,
+                "restart": not resume,
+            })
+
+        job = None
+        if st.session_state.get("scrape_job"):
+            job = show_job(st.session_state.scrape_job, on_poll=lambda job: show_partial(job, "scraped_data_partial.csv"))
+        if job is not None and job["state"] == DONE:
+            frames = get_frame_cache()
+            queue = JobQueue()
+            try:
+                df_scraped = frames.get_or_build(("scrape", job["job_id"]), lambda: scraped_frame(queue.results(job["run_id"])))
+                failures = queue.failures(job["run_id"])
+            finally:
+                queue.close()
+            show_errors(failures)
+            if not df_scraped.empty:
+                counts = language_counts(df_scraped)
+                st.write(" | ".join(f"{language}: {count}" for language, count in counts.items()))
+                if "Method" in df_scraped:
+                    methods = df_scraped["Method"].value_counts()
+                    st.write(" | ".join(f"{method}: {count}" for method, count in methods.items()))
+
+            # Save the scraped data in the chosen format
+            if not df_scraped.empty:
                 st.download_button(
                     label="Download Scraped Data",
-                    data=output.getvalue(),
-                    file_name="scraped_data.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                    data=frames.get_or_build(
+                        ("scrape-export", job["job_id"], export_format),
+                        lambda: export_frames(df_scraped, export_format, sheet_name='Scraped Data'),
+                    ),
+                    file_name=f"scraped_data.{export_format}",
+                    mime=MIME_TYPES[export_format]
                 )
                 st.success("Scraping completed and file is ready for download.")
             else:
                 st.warning("No data was scraped.")
-                    
-    
-    # Page 3
 
-def send_email(smtp_server, smtp_port, sender_email, sender_password, recipient_email, subject, message, attachment=None):
-    try:
-        # Set up the email message
-        msg = MIMEMultipart()
-        msg['From'] = sender_email
-        msg['To'] = recipient_email
-        msg['Subject'] = subject
-
-        # Attach the message body
-        msg.attach(MIMEText(message, 'plain'))
-
-        # Attach the file if provided
-        if attachment:
-            part = MIMEBase('application', 'octet-stream')
-            part.set_payload(attachment.read())
-            encoders.encode_base64(part)
-            part.add_header('Content-Disposition', f"attachment; filename= {attachment.name}")
-            msg.attach(part)
-
-        # Connect to the SMTP server and send the email
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()  # Secure the connection
-        server.login(sender_email, sender_password)  # Login to the email server
-        server.sendmail(sender_email, recipient_email, msg.as_string())  # Send the email
-        server.quit()  # Disconnect from the server
-
-        return True
-    except Exception as e:
-        st.error(f"Error sending email to {recipient_email}: {str(e)}")
-        return False
+
+    # Page 3
 
 def page_3():
     st.title("Email Configuration")
@@ -268,6 +209,7 @@ def page_3():
     smtp_port = st.number_input("SMTP Port", value=587)
     sender_email = st.text_input("Sender Email", "fabricamaroc@gmail.com")
     sender_password = st.text_input("Sender Password", "itsy bqfi xxmw ztud", type="password")
+    use_tls = st.checkbox("Use STARTTLS", value=True)
 
     # Language-specific inputs
     en_subject = st.text_input("🇬🇧 EN Subject")
@@ -280,7 +222,14 @@ def page_3():
     fr_attach = st.file_uploader("🇫🇷 FR Attachment", accept_multiple_files=False)
 
     # Contacts file upload
-    contacts_file = st.file_uploader("Upload Contacts (Excel file)", type=["xlsx", "xls"])
+    contacts_file = st.file_uploader("Upload Contacts (Excel, CSV or Parquet file)", type=["xlsx", "xls", "csv", "txt", "parquet"])
+    restart = st.checkbox("Start this contacts file over", value=False)
+    skip_seen = st.checkbox("Skip addresses already emailed in earlier runs", value=True)
+
+    # Send budget: how many emails this click sends (0 sends every pending one) and how fast the
+    # worker may hand them to the server
+    limit = st.number_input("Emails to send (0 for all pending)", min_value=0, value=100)
+    per_minute = st.number_input("Emails per minute", min_value=1, value=60)
 
     # Send Button
     if st.button("Send Emails"):
@@ -289,72 +238,66 @@ def page_3():
             return
 
         try:
-            # Load contacts file
-            df = pd.read_excel(contacts_file)
+            # Check the headers, the contacts file is parsed once per content
+            columns = get_frame_cache().columns(contacts_file)
 
-            if "Qualification" not in df.columns or "Email" not in df.columns:
+            if "Qualification" not in columns or "Email" not in columns:
                 st.error("The contacts file must have 'Qualification' and 'Email' columns.")
                 return
 
-            # Filter rows to send a max of 100 emails
-            df_to_send = df.head(100)  # Select first 2 rows
-
-            if df_to_send.empty:
-                st.info("No more emails to send!")
-                return
-
-            # Initialize progress bar
-            total_emails = len(df_to_send)
-            progress = st.progress(0)
-            status_text = st.empty()  # Placeholder for status messages
-
-            # Send emails for the selected contacts
-            for index, row in df_to_send.iterrows():
-                qualification = row["Qualification"]
-                recipient_email = row["Email"]
-
-                if qualification.lower() == "english":
-                    subject = en_subject
-                    message = en_message
-                    attachment = en_attach
-                elif qualification.lower() == "french":
-                    subject = fr_subject
-                    message = fr_message
-                    attachment = fr_attach
-                elif qualification.lower() == "English or French":
-                    subject = en_subject
-                    message = en_message
-                    attachment = en_attach
-                else:
-                    st.warning(f"Unknown qualification '{qualification}' for email {recipient_email}. Skipping.")
-                    continue
-
-                # Send the email using the SMTP settings
-                if send_email(smtp_server, smtp_port, sender_email, sender_password, recipient_email, subject, message, attachment):
-                    st.success(f"Email sent successfully to {recipient_email}")
-
-                # Update progress bar and status
-                progress.progress((index + 1) / total_emails)
-                status_text.text(f"Sending email {index + 1} of {total_emails}: {recipient_email}")
-
-                # Simulate a slight delay for smoother progress bar update
-                time.sleep(0.5)
-
-            # Remove sent emails from the DataFrame
-            df = df.iloc[100:]  # Drop the first 100 rows
-
-            # Save the updated contacts file back to Excel
-            updated_file = "updated_contacts.xlsx"
-            df.to_excel(updated_file, index=False)
-
-            st.success("Processed emails and updated the contact file.")
-
-            # Provide download link for updated file
-            st.download_button(label="Download Updated Contacts File", data=open(updated_file, 'rb'), file_name=updated_file, mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+            # Per-recipient state survives a dropped session, the same file continues where it stopped
+            attachments = {
+                name: (upload.name, save_upload(upload)) if upload is not None else None
+                for name, upload in (("en_attach", en_attach), ("fr_attach", fr_attach))
+            }
+            contacts_path = save_upload(contacts_file)
+            st.session_state.send_job = get_worker().submit("send", run_id_for_key("send", get_frame_cache().key(contacts_file)), {
+                "path": contacts_path,
+                "restart": restart,
+                "skip_seen": skip_seen,
+                "limit": int(limit),
+                "host_limits": {smtp_server: {"concurrency": 1, "rate": per_minute / 60}},
+                "smtp_server": smtp_server,
+                "smtp_port": smtp_port,
+                "sender_email": sender_email,
+                "sender_password": sender_password,
+                "use_tls": use_tls,
+                "en_subject": en_subject,
+                "fr_subject": fr_subject,
+                "en_message": en_message,
+                "fr_message": fr_message,
+                **attachments,
+            })
+            st.session_state.send_contacts = contacts_path
 
         except Exception as e:
             st.error(f"An error occurred: {str(e)}")
 
+    job = show_job(st.session_state.send_job, on_poll=show_job_errors) if st.session_state.get("send_job") else None
+    if job is not None and job["state"] == DONE:
+        queue = JobQueue()
+        try:
+            sent = set(queue.keys(job["run_id"], DONE))
+            failures = queue.failures(job["run_id"])
+        finally:
+            queue.close()
+        show_errors(failures)
+
+        # Remove the emails that were actually delivered, streaming the contacts chunk by chunk.
+        def build_updated_contacts():
+            contacts_path = st.session_state.send_contacts
+            with open(contacts_path, "rb") as contacts:
+                remaining = (chunk[~normalize_emails(chunk["Email"]).isin(sent)] for chunk in iter_chunks(contacts, contacts_path))
+                return frame_to_csv_bytes(remaining)
+
+        updated = get_frame_cache().get_or_build(("updated-contacts", job["job_id"]), build_updated_contacts)
+        updated_file = "updated_contacts.csv"
+
+        st.success(f"Processed emails and updated the contact file. Delivery results are logged to {SENT_LOG_FILE}.")
+
+        # Provide download link for updated file
+        st.download_button(label="Download Updated Contacts File", data=updated, file_name=updated_file, mime="text/csv")
+
 # Include this page in your main function
 def main():
     st.sidebar.title("Options")
@@ -0,0 +1,37 @@
+# Time the vectorized email normalization and language classification on a synthetic frame.
+#
+#   python benchmarks/bench_classify.py --rows 100000
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from classify import classify_contacts, language_counts
+
+QUALIFICATIONS = ["English", "French", "English or French", "Anglais et français", "Spanish", None]
+EMAILS = ["Jobs{}@Acme.ca", "rh{}@entreprise.qc.ca.", "No email found", "apply to hr{}@example.com now", None]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    frame = pd.DataFrame({
+        "Title": [f"Cook {i}" for i in range(args.rows)],
+        "Qualification": [QUALIFICATIONS[i % len(QUALIFICATIONS)] for i in range(args.rows)],
+        "Email": [EMAILS[i % len(EMAILS)] and EMAILS[i % len(EMAILS)].format(i) for i in range(args.rows)],
+    })
+
+    start = time.perf_counter()
+    classified = classify_contacts(frame)
+    elapsed = time.perf_counter() - start
+    print(f"{args.rows} rows in {elapsed * 1000:.1f} ms")
+    print(language_counts(classified))
+
+
+if __name__ == "__main__":
+    main()
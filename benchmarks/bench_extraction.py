@@ -0,0 +1,74 @@
+# Compare per-element WebDriver extraction with the single execute_script pass of extract_jobs.
+# Needs Firefox and geckodriver.
+#
+#   python benchmarks/bench_extraction.py --articles 2000
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from selenium.webdriver.common.by import By
+from driver_pool import make_driver
+from fixtures import FixtureServer, load_fixtures, write_search_fixtures
+from search_scraper import LOGIN_URL, extract_jobs
+
+
+def extract_per_element(driver):
+    # The extraction loop run_scraper used before extract_jobs
+    data = []
+    articles = driver.find_elements(By.TAG_NAME, "article")
+    for article in articles:
+        spans = article.find_elements(By.CLASS_NAME, "noctitle")
+        for span in spans:
+            title = span.text
+            links = article.find_elements(By.TAG_NAME, "a")
+            for link in links:
+                href = link.get_attribute("href")
+                if href and LOGIN_URL not in href:
+                    data.append({"Title": title, "Link": href})
+    return data
+
+
+def extract_single_pass(driver):
+    return extract_jobs(driver)[1]
+
+
+def count_round_trips(driver):
+    # Every WebDriver command, element calls included, goes through driver.execute
+    counter = {"calls": 0}
+    execute = driver.execute
+
+    def counting_execute(*args, **kwargs):
+        counter["calls"] += 1
+        return execute(*args, **kwargs)
+
+    driver.execute = counting_execute
+    return counter
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=500)
+    args = parser.parse_args()
+
+    directory = write_search_fixtures(tempfile.mkdtemp(), pages=1, per_page=args.articles)
+    with FixtureServer(load_fixtures(directory)) as server:
+        driver = make_driver()
+        try:
+            driver.get(server.search_url)
+            counter = count_round_trips(driver)
+            for name, extract in (("per-element", extract_per_element), ("single pass", extract_single_pass)):
+                counter["calls"] = 0
+                start = time.perf_counter()
+                rows = extract(driver)
+                elapsed = time.perf_counter() - start
+                print(f"{name:<12} {elapsed:8.3f} s  {counter['calls']:>7} round-trips  {len(rows)} rows")
+        finally:
+            driver.quit()
+
+
+if __name__ == "__main__":
+    main()
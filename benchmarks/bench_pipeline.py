@@ -0,0 +1,168 @@
+# End-to-end offline run of the three pages against local fixtures: the search scrape, the
+# page_2 posting scrape and the page_3 send through a local SMTP sink. Every size runs in its
+# own process so the peak RSS is per size. Reports throughput and latency percentiles per stage.
+#
+#   python benchmarks/bench_pipeline.py --sizes 10,100,1000,10000
+#   python benchmarks/bench_pipeline.py --sizes 100 --engine browser --workers 4 --latency 0.05
+#   python benchmarks/bench_pipeline.py --fixtures recorded/ --sizes 500 --json results.json
+import argparse
+import json
+import math
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from fixtures import FixtureServer, SmtpSink, load_fixtures, load_postings, write_search_fixtures
+from job_queue import JobQueue
+from metrics import Metrics
+from posting_scraper import scrape_postings
+from scheduler import default_scheduler
+from search_scraper import run_crawler, run_scraper
+from worker import send_emails
+
+# Per-item latency each stage's percentiles are taken from
+LATENCY_STAGES = {
+    "search": {"http": "page_fetch", "browser": "wait_morepage"},
+    "postings": "http_fetch",
+    "send": "smtp_send",
+}
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_size(size, args):
+    # One size end to end, in a scratch directory so queue, dedup and result files start empty
+    recorded = os.path.abspath(args.fixtures) if args.fixtures else None
+    os.chdir(tempfile.mkdtemp())
+    per_page = min(args.per_page, size)
+    if recorded:
+        directory = recorded
+    else:
+        directory = write_search_fixtures("fixtures", math.ceil(size / per_page), per_page)
+    metrics = Metrics()
+    stages = {}
+
+    def stage(name, fn):
+        start = time.perf_counter()
+        items = fn()
+        elapsed = time.perf_counter() - start
+        stages[name] = {"items": items, "seconds": round(elapsed, 3),
+                        "items_per_sec": round(items / elapsed, 1) if elapsed else None,
+                        "peak_rss_mb": round(peak_rss_mb(), 1)}
+
+    def open_host(host):
+        # Local fixtures get the budget given on the command line, wide open by default
+        default_scheduler.configure(host, concurrency=args.host_concurrency, rate=args.host_rate,
+                                    burst=args.host_concurrency)
+
+    with FixtureServer(load_fixtures(directory), latency=args.latency, postings=load_postings(directory)) as server:
+        open_host(urlsplit(server.search_url).netloc)
+        rows = []
+
+        def search():
+            if args.engine == "browser":
+                rows.extend(run_scraper(server.search_url, metrics=metrics))
+            else:
+                rows.extend(run_crawler(server.search_url, concurrency=args.concurrency, metrics=metrics))
+            del rows[size:]
+            return len(rows)
+
+        scraped = []
+
+        def postings():
+            scraped.extend(scrape_postings([(row["Title"], row["Link"]) for row in rows], workers=args.workers,
+                                           http_workers=args.http_workers, metrics=metrics))
+            return len(scraped)
+
+        stage("search", search)
+        stage("postings", postings)
+
+    pd.DataFrame(scraped).to_csv("contacts.csv", index=False)
+    with SmtpSink(latency=args.smtp_latency) as sink:
+        open_host("127.0.0.1")
+        def send():
+            queue = JobQueue()
+            job_id = uuid.uuid4().hex
+            queue.create_job(job_id, "send", job_id)
+            send_emails(job_id, job_id, {
+                "path": "contacts.csv",
+                "limit": len(scraped),
+                "skip_seen": False,
+                "smtp_server": "127.0.0.1",
+                "smtp_port": sink.port,
+                "sender_email": "bench@example.com",
+                "sender_password": "",
+                "use_tls": False,
+                "en_subject": "Application",
+                "fr_subject": "Candidature",
+                "en_message": "Hello,\n\nPlease find my application attached.",
+                "fr_message": "Bonjour,\n\nVeuillez trouver ma candidature ci-jointe.",
+            }, queue, metrics)
+            queue.close()
+            return sink.messages
+
+        stage("send", send)
+
+    return {"size": size, "engine": args.engine, "stages": stages, "metrics": metrics.report(),
+            "peak_rss_mb": round(peak_rss_mb(), 1)}
+
+
+def latency(result, name):
+    stage = LATENCY_STAGES[name]
+    if isinstance(stage, dict):
+        stage = stage[result["engine"]]
+    return result["metrics"]["stages"].get(stage, {})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10,100,1000,10000", help="number of postings per run")
+    parser.add_argument("--fixtures", help="directory of recorded page_N.html, posting_<id>.html and apply_<id>.xml")
+    parser.add_argument("--per-page", type=int, default=25)
+    parser.add_argument("--engine", choices=["http", "browser"], default="http", help="search scraper to drive")
+    parser.add_argument("--concurrency", type=int, default=4, help="search pages in flight (http engine)")
+    parser.add_argument("--http-workers", type=int, default=8, help="posting fetches in flight")
+    parser.add_argument("--workers", type=int, default=4, help="browsers for postings that need one")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every HTTP response")
+    parser.add_argument("--smtp-latency", type=float, default=0.0, help="seconds added to every SMTP message")
+    parser.add_argument("--host-concurrency", type=int, default=64, help="requests in flight per local host")
+    parser.add_argument("--host-rate", type=float, default=1e6, help="requests per second per local host")
+    parser.add_argument("--json", help="write the full results to this file")
+    parser.add_argument("--one", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.one is not None:
+        print(json.dumps(run_size(args.one, args)))
+        return
+
+    results = []
+    print(f"{'size':>6} {'stage':<9} {'items':>6} {'seconds':>8} {'items/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'rss MB':>7}")
+    for size in [int(size) for size in args.sizes.split(",")]:
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), *sys.argv[1:], "--one", str(size)],
+                                check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        results.append(result)
+        for name, stage in result["stages"].items():
+            timing = latency(result, name)
+            print(f"{size:>6} {name:<9} {stage['items']:>6} {stage['seconds']:>8.2f} {stage['items_per_sec'] or 0:>9.1f}"
+                  f" {timing.get('p50', 0) * 1000:>8.1f} {timing.get('p95', 0) * 1000:>8.1f} {stage['peak_rss_mb']:>7.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
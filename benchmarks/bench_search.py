@@ -0,0 +1,57 @@
+# Compare the click-to-load browser scraper with the async HTTP crawler on a fixture set.
+#
+#   python benchmarks/bench_search.py --pages 40 --per-page 25 --latency 0.2
+#   python benchmarks/bench_search.py --fixtures recorded/ --browser
+import argparse
+import os
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import FixtureServer, load_fixtures, write_search_fixtures
+from scheduler import default_scheduler
+from search_scraper import run_crawler
+
+
+def timed(fn):
+    start = time.perf_counter()
+    rows = fn()
+    return time.perf_counter() - start, rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fixtures", help="directory of page_N.html files, generated when omitted")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--per-page", type=int, default=25)
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds added to every response")
+    parser.add_argument("--concurrency", default="1,4,8")
+    parser.add_argument("--browser", action="store_true", help="also time the Firefox click loop")
+    parser.add_argument("--host-concurrency", type=int, default=64, help="requests in flight to the local host")
+    parser.add_argument("--host-rate", type=float, default=1e6, help="requests per second to the local host")
+    args = parser.parse_args()
+
+    directory = args.fixtures or write_search_fixtures(tempfile.mkdtemp(), args.pages, args.per_page)
+    fixtures = load_fixtures(directory)
+
+    with FixtureServer(fixtures, latency=args.latency) as server:
+        # The local host gets the budget given on the command line, wide open by default,
+        # so the crawler's own concurrency is what is measured
+        default_scheduler.configure(urlsplit(server.search_url).netloc, concurrency=args.host_concurrency,
+                                    rate=args.host_rate, burst=args.host_concurrency)
+        print(f"{len(fixtures)} pages, {args.latency * 1000:.0f} ms latency")
+        for concurrency in [int(c) for c in args.concurrency.split(",")]:
+            elapsed, rows = timed(lambda: run_crawler(server.search_url, concurrency=concurrency))
+            print(f"crawler  concurrency={concurrency:<3} {elapsed:8.2f} s  {len(rows)} rows")
+
+        if args.browser:
+            from search_scraper import run_scraper
+            elapsed, rows = timed(lambda: run_scraper(server.search_url))
+            print(f"browser  click loop      {elapsed:8.2f} s  {len(rows)} rows")
+
+
+if __name__ == "__main__":
+    main()
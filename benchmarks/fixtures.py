@@ -0,0 +1,268 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+import os
+import re
+import socketserver
+import threading
+import time
+
+SEARCH_PATH = "/jobsearch/jobsearch"
+LOADER_PATH = "/jobsearch/job_search_loader.xhtml"
+POSTING_RE = re.compile(r'^/jobsearch/jobposting/(\d+)$')
+
+LANGUAGES = ["English", "French", "English or French"]
+
+# Clicking "more" fetches the next loader fragment and appends it, like the live site
+MOREPAGE_SCRIPT = """
+<script>
+var nextPage = 2;
+function loadMore() {
+  var button = document.querySelector('#morepage button');
+  button.disabled = true;
+  fetch('%s?page=' + nextPage).then(function (r) { return r.text(); }).then(function (html) {
+    var block = document.getElementById('result_block');
+    block.insertAdjacentHTML('beforeend', html);
+    nextPage += 1;
+    if (html.indexOf('<article') === -1 || nextPage > %d) {
+      document.getElementById('morepage').remove();
+    } else {
+      button.disabled = false;
+    }
+  });
+}
+</script>
+"""
+
+
+def article_html(posting_id, title):
+    return (
+        f'<article id="article-{posting_id}" class="action-buttons">'
+        f'<a href="/jobsearch/jobposting/{posting_id}?source=searchresults" class="resultJobItem">'
+        f'<h3 class="title"><span class="noctitle">{title}</span></h3>'
+        f'<ul class="list-unstyled"><li class="date">October 18, 2026</li></ul></a>'
+        f'<a href="https://www.jobbank.gc.ca/login">Save to favourites</a>'
+        f'</article>\n'
+    )
+
+
+def fragment_html(page, per_page):
+    start = (page - 1) * per_page
+    return "".join(article_html(1000000 + start + i, f"Cook {start + i}") for i in range(per_page))
+
+
+def search_page_html(pages, per_page):
+    more = ""
+    if pages > 1:
+        more = '<div id="morepage"><button onclick="loadMore()">Show more results</button></div>'
+    return (
+        "<html><head><title>Job search</title></head><body>"
+        + (MOREPAGE_SCRIPT % (LOADER_PATH, pages))
+        + '<div id="result_block">' + fragment_html(1, per_page) + "</div>"
+        + more + "</body></html>"
+    )
+
+
+# The apply button posts the JSF ajax request and renders the partial response, like the live site
+APPLY_SCRIPT = """
+<script>
+function applyNow(button) {
+  var form = button.form;
+  var data = new URLSearchParams(new FormData(form));
+  data.append('javax.faces.source', button.id);
+  data.append('javax.faces.partial.ajax', 'true');
+  fetch(form.action, {method: 'POST', body: data, headers: {'Faces-Request': 'partial/ajax'}})
+    .then(function (r) { return r.text(); })
+    .then(function (xml) {
+      var doc = new DOMParser().parseFromString(xml, 'text/xml');
+      document.getElementById('howtoapply').innerHTML = doc.querySelector('update').textContent;
+    });
+}
+</script>
+"""
+
+
+def posting_email(posting_id):
+    return f"employer{posting_id}@example.com"
+
+
+def posting_html(posting_id):
+    language = LANGUAGES[posting_id % len(LANGUAGES)]
+    return (
+        "<html><head><title>Job posting</title></head><body>" + APPLY_SCRIPT
+        + f'<h1 property="title">Cook {posting_id}</h1>'
+        + f'<p property="qualification">Languages: {language}</p>'
+        + f'<form id="applyform" name="applyform" method="post" action="/jobsearch/jobposting/{posting_id}">'
+        + f'<input type="hidden" name="javax.faces.ViewState" value="state-{posting_id}"/>'
+        + '<button id="applynowbutton" name="applynowbutton" type="button" onclick="applyNow(this)">Show how to apply</button>'
+        + '</form><div id="howtoapply"></div></body></html>'
+    )
+
+
+def apply_response_xml(posting_id):
+    fragment = f'<p>By email</p><p><a href="mailto:{posting_email(posting_id)}">{posting_email(posting_id)}</a></p>'
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><partial-response><changes>'
+        f'<update id="howtoapply"><![CDATA[{fragment}]]></update>'
+        '</changes></partial-response>'
+    )
+
+
+def write_search_fixtures(directory, pages=20, per_page=25):
+    # Layout a recorded set should follow too: page_1.html is the full search page,
+    # page_N.html are the raw loader fragments
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "page_1.html"), "w") as f:
+        f.write(search_page_html(pages, per_page))
+    for page in range(2, pages + 1):
+        with open(os.path.join(directory, f"page_{page}.html"), "w") as f:
+            f.write(fragment_html(page, per_page))
+    return directory
+
+
+def load_fixtures(directory):
+    fixtures = {}
+    for name in os.listdir(directory):
+        if name.startswith("page_") and name.endswith(".html"):
+            with open(os.path.join(directory, name), "rb") as f:
+                fixtures[int(name[5:-5])] = f.read()
+    return fixtures
+
+
+def load_postings(directory):
+    # Recorded postings: posting_<id>.html is the page, apply_<id>.xml the partial response of
+    # the apply click. Postings without a recording are generated from their id.
+    postings = {}
+    for name in os.listdir(directory):
+        match = re.match(r'^(posting|apply)_(\d+)\.(html|xml)$', name)
+        if match:
+            with open(os.path.join(directory, name), "rb") as f:
+                postings[(match.group(1), int(match.group(2)))] = f.read()
+    return postings
+
+
+class FixtureServer:
+    # Serves a fixture set on localhost with an optional per-request latency: search pages,
+    # loader fragments, and the postings they link to with their apply responses
+
+    def __init__(self, fixtures, latency=0.0, postings=None):
+        self.fixtures = fixtures
+        self.postings = postings or {}
+        self.latency = latency
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def respond(self, body, content_type="text/html; charset=utf-8"):
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                parts = urlsplit(self.path)
+                posting = POSTING_RE.match(parts.path)
+                if parts.path == SEARCH_PATH:
+                    body = server.fixtures.get(1, b"")
+                elif parts.path == LOADER_PATH:
+                    page = int(parse_qs(parts.query).get("page", ["1"])[0])
+                    body = server.fixtures.get(page, b"")
+                elif posting:
+                    posting_id = int(posting.group(1))
+                    body = server.postings.get(("posting", posting_id)) or posting_html(posting_id).encode()
+                else:
+                    self.send_error(404)
+                    return
+                self.respond(body)
+
+            def do_POST(self):
+                # The JSF apply click
+                server.requests += 1
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if server.latency:
+                    time.sleep(server.latency)
+                posting = POSTING_RE.match(urlsplit(self.path).path)
+                if not posting:
+                    self.send_error(404)
+                    return
+                posting_id = int(posting.group(1))
+                body = server.postings.get(("apply", posting_id)) or apply_response_xml(posting_id).encode()
+                self.respond(body, "text/xml; charset=utf-8")
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def search_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_port}{SEARCH_PATH}?searchstring=cook&sort=D"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class SmtpSink:
+    # Minimal local SMTP server that accepts and counts every message, no TLS and no auth.
+    # Use it with Mailer(..., use_tls=False) and an empty password.
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.messages = 0
+        self.lock = threading.Lock()
+        sink = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write(line.encode() + b"\r\n")
+
+            def handle(self):
+                self.reply("220 localhost SMTP sink")
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    command = line.decode("utf-8", "replace").strip().split(" ", 1)[0].upper()
+                    if command in ("EHLO", "HELO"):
+                        self.reply("250 localhost")
+                    elif command == "DATA":
+                        self.reply("354 End data with <CR><LF>.<CR><LF>")
+                        while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                            pass
+                        if sink.latency:
+                            time.sleep(sink.latency)
+                        with sink.lock:
+                            sink.messages += 1
+                        self.reply("250 OK")
+                    elif command == "QUIT":
+                        self.reply("221 Bye")
+                        return
+                    elif command in ("MAIL", "RCPT", "RSET", "NOOP"):
+                        self.reply("250 OK")
+                    else:
+                        self.reply("502 Command not implemented")
+
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,102 @@
+import re
+
+# pandas and numpy are imported inside the vectorized helpers, so the scrapers that only
+# need first_email start without them
+
+EMAIL_PATTERN = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b'
+EMAIL_RE = re.compile(EMAIL_PATTERN)
+
+# Language codes page_3 picks a template with
+EN = "EN"
+FR = "FR"
+BOTH = "BOTH"
+UNKNOWN = "UNKNOWN"
+LANGUAGES = [EN, FR, BOTH, UNKNOWN]
+
+ENGLISH_RE = r'\b(?:english|anglais)\b'
+FRENCH_RE = r'\b(?:french|fran[cç]ais)\b'
+
+# How a posting takes applications. Only email postings are worth the apply click.
+METHOD_EMAIL = "email"
+METHOD_EXTERNAL = "external"
+METHOD_IN_PERSON = "in person"
+METHOD_EXPIRED = "expired"
+METHOD_UNKNOWN = "unknown"
+
+EXPIRED_RE = re.compile(
+    r"no longer (?:available|accepting)|has expired|n'est plus (?:disponible|affich[ée]e)|a expir[ée]", re.IGNORECASE
+)
+IN_PERSON_RE = re.compile(r'\bin person\b|\ben personne\b', re.IGNORECASE)
+ONLINE_RE = re.compile(r'\bonline\b|\ben ligne\b|https?://|www\.', re.IGNORECASE)
+# Text of a link that sends the applicant to another site; plain string so the browser can use it too
+APPLY_LINK_PATTERN = r"apply|postuler|employer's website|site web de l'employeur"
+
+
+def first_email(text):
+    match = EMAIL_RE.search(text or "")
+    return match.group(0) if match else None
+
+
+def page_method(page_text, external_link):
+    # Pre-click verdict for a posting page without an apply button
+    if EXPIRED_RE.search(page_text or ""):
+        return METHOD_EXPIRED
+    if external_link:
+        return METHOD_EXTERNAL
+    return METHOD_UNKNOWN
+
+
+def application_method(how_to_apply_text):
+    # Route named in the rendered "how to apply" section
+    text = how_to_apply_text or ""
+    if first_email(text):
+        return METHOD_EMAIL
+    if IN_PERSON_RE.search(text):
+        return METHOD_IN_PERSON
+    if ONLINE_RE.search(text):
+        return METHOD_EXTERNAL
+    return METHOD_UNKNOWN
+
+
+def on_distinct(values, transform):
+    # Scraped columns repeat a lot ("No email found", "English"...), so the regexes only
+    # run over the distinct values and the result is broadcast back
+    import pandas as pd
+    codes, uniques = pd.factorize(values.astype("string"), use_na_sentinel=True)
+    mapped = transform(pd.Series(uniques, dtype="string"))
+    mapped = pd.concat([mapped, transform(pd.Series([pd.NA], dtype="string"))], ignore_index=True)
+    return pd.Series(mapped.to_numpy()[codes], index=values.index, dtype=mapped.dtype)
+
+
+def normalize_emails(emails):
+    # First address of each value, lowercased; values without one come back as NA
+    return on_distinct(emails, lambda text: text.str.extract(f"({EMAIL_PATTERN})", expand=False).str.lower())
+
+
+def classify_language(qualifications):
+    # "English", "French", "English or French", "Anglais et français"... to EN/FR/BOTH/UNKNOWN
+    import numpy as np
+    import pandas as pd
+
+    def classify(text):
+        text = text.str.lower()
+        english = text.str.contains(ENGLISH_RE, regex=True).to_numpy(dtype=bool, na_value=False)
+        french = text.str.contains(FRENCH_RE, regex=True).to_numpy(dtype=bool, na_value=False)
+        return pd.Series(np.select([english & french, english, french], [BOTH, EN, FR], default=UNKNOWN), dtype=object)
+
+    return on_distinct(qualifications, classify)
+
+
+def classify_contacts(frame):
+    # Whole-frame pass over scraped or uploaded contacts: normalized Email plus a Language column.
+    # Blank Email cells become "", the send queue keys recipients by address and cannot hold NA
+    frame = frame.copy()
+    normalized = normalize_emails(frame["Email"])
+    frame["Email"] = normalized.fillna(frame["Email"].astype("string")).fillna("")
+    frame["Language"] = classify_language(frame["Qualification"])
+    return frame
+
+
+def language_counts(frame):
+    counts = frame["Language"].value_counts()
+    return {language: int(counts.get(language, 0)) for language in LANGUAGES}
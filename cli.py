@@ -0,0 +1,229 @@
+# Headless entry point for cron and servers, running the same engine as the Streamlit pages.
+#
+#   python cli.py scrape-search "https://www.jobbank.gc.ca/jobsearch/jobsearch?searchstring=cook&sort=D" --new-only
+#   python cli.py scrape-emails job_Links.csv --format csv --output scraped.csv
+#   SMTP_PASSWORD=... python cli.py send scraped.csv --sender-email me@example.com \
+#       --en-subject "Application" --en-message en.txt --fr-subject "Candidature" --fr-message fr.txt
+#
+# Results stream to stdout (or --output) as JSON lines or CSV, progress and the summary go to
+# stderr. scrape-emails and send keep their state in the job queue like the pages do, so
+# running the same file again resumes it. Engine modules are imported by the subcommand that
+# uses them, so a crawl starts without pandas or Selenium.
+import argparse
+import csv
+import json
+import os
+import sys
+import uuid
+
+SEARCH_COLUMNS = ["Title", "Link"]
+SCRAPE_COLUMNS = ["Title", "Link", "Qualification", "Email", "Method"]
+SEND_COLUMNS = ["Email", "Qualification", "Status", "Error", "Time"]
+
+
+class RowWriter:
+    # JSON lines or CSV, flushed after every batch so the output can be tailed
+
+    def __init__(self, output, fmt, columns):
+        self.output = output
+        self.writer = None
+        if fmt == "csv":
+            self.writer = csv.DictWriter(output, fieldnames=columns, extrasaction="ignore")
+            self.writer.writeheader()
+
+    def write(self, rows):
+        for row in rows:
+            if self.writer is not None:
+                self.writer.writerow(row)
+            else:
+                self.output.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+        self.output.flush()
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def write_metrics(path, report):
+    if path:
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def scrape_search(args, writer):
+    from metrics import Metrics
+    from search_scraper import run_scraper, run_crawler, new_postings
+
+    metrics = Metrics()
+    if args.engine == "browser":
+        scrape = run_scraper
+        options = dict(on_status=lambda message, progress: log(message))
+    else:
+        scrape = run_crawler
+        options = dict(concurrency=args.concurrency, on_page=lambda page, rows: log(f"Page {page}: {len(rows)} jobs"))
+    options.update(metrics=metrics, on_rows=writer.write)
+    configure_hosts(args.host_limit)
+
+    rows = new_postings(args.url, scrape, **options) if args.new_only else scrape(args.url, **options)
+    log(f"{len(rows)} {'new ' if args.new_only else ''}jobs")
+    write_metrics(args.metrics, metrics.report())
+    return 0
+
+
+def host_limit(value):
+    # HOST=CONCURRENCY or HOST=CONCURRENCY/RATE, rate in requests per second
+    host, _, budget = value.partition("=")
+    concurrency, _, rate = budget.partition("/")
+    try:
+        limits = {"concurrency": int(concurrency)}
+        if rate:
+            limits["rate"] = float(rate)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected HOST=CONCURRENCY[/RATE], got {value!r}")
+    if not host:
+        raise argparse.ArgumentTypeError(f"expected HOST=CONCURRENCY[/RATE], got {value!r}")
+    return host, limits
+
+
+def configure_hosts(host_limits):
+    from scheduler import default_scheduler
+    for host, limits in host_limits:
+        default_scheduler.configure(host, **limits)
+
+
+def run_file_job(kind, path, params, args, writer):
+    # Same job the pages submit to the background worker, run in this process
+    from job_queue import JobQueue, run_id_for, FAILED
+    from worker import run_job
+
+    params["host_limits"] = {**dict(args.host_limit), **params.get("host_limits", {})}
+    with open(path, "rb") as f:
+        run_id = run_id_for(kind, f.read())
+    job_id = uuid.uuid4().hex
+    queue = JobQueue()
+    try:
+        queue.create_job(job_id, kind, run_id)
+        run_job(job_id, kind, run_id, params, on_rows=writer.write)
+        job = queue.get_job(job_id)
+        counts = queue.counts(run_id)
+    finally:
+        queue.close()
+
+    if job["message"]:
+        log(job["message"])
+    log(" | ".join(f"{state}: {count}" for state, count in counts.items()))
+    write_metrics(args.metrics, job["metrics"])
+    if job["state"] == FAILED:
+        log(f"Failed: {job['error']}")
+        return 1
+    return 0
+
+
+def scrape_emails(args, writer):
+    path = os.path.abspath(args.file)
+    return run_file_job("scrape", path, {
+        "path": path,
+        "workers": args.workers,
+        "use_cache": not args.no_cache,
+        "skip_seen": not args.include_seen,
+        "restart": args.restart,
+    }, args, writer)
+
+
+def send(args, writer):
+    password = os.environ.get(args.password_env, "")
+
+    def read(path):
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    def attachment(path):
+        return (os.path.basename(path), os.path.abspath(path)) if path else None
+
+    path = os.path.abspath(args.file)
+    host_limits = {}
+    if args.per_minute:
+        host_limits[args.smtp_server] = {"concurrency": 1, "rate": args.per_minute / 60}
+    return run_file_job("send", path, {
+        "path": path,
+        "restart": args.restart,
+        "skip_seen": not args.include_seen,
+        "limit": args.limit,
+        "host_limits": host_limits,
+        "smtp_server": args.smtp_server,
+        "smtp_port": args.smtp_port,
+        "sender_email": args.sender_email,
+        "sender_password": password,
+        "use_tls": not args.no_tls,
+        "en_subject": args.en_subject,
+        "fr_subject": args.fr_subject,
+        "en_message": read(args.en_message),
+        "fr_message": read(args.fr_message),
+        "en_attach": attachment(args.en_attach),
+        "fr_attach": attachment(args.fr_attach),
+    }, args, writer)
+
+
+COMMANDS = {
+    "scrape-search": (scrape_search, SEARCH_COLUMNS),
+    "scrape-emails": (scrape_emails, SCRAPE_COLUMNS),
+    "send": (send, SEND_COLUMNS),
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Job Bank scraper and mailer")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    common.add_argument("--output", help="file to write results to, stdout by default")
+    common.add_argument("--metrics", help="write the timing report as JSON to this file")
+    common.add_argument("--host-limit", type=host_limit, action="append", default=[], metavar="HOST=N[/RATE]",
+                        help="requests in flight (and per second) allowed to HOST, repeatable")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    search = commands.add_parser("scrape-search", parents=[common], help="job links of a Job Bank search")
+    search.add_argument("url")
+    search.add_argument("--engine", choices=["http", "browser"], default="http")
+    search.add_argument("--concurrency", type=int, default=4, help="pages in flight (http engine)")
+    search.add_argument("--new-only", action="store_true", help="only postings this search has not returned before")
+
+    emails = commands.add_parser("scrape-emails", parents=[common], help="email and qualification of each posting")
+    emails.add_argument("file", help="CSV, TXT, XLSX or Parquet file with Title and Link columns")
+    emails.add_argument("--workers", type=int, default=4, help="browsers for postings that need one")
+    emails.add_argument("--no-cache", action="store_true", help="fetch postings scraped in the last 24 hours again")
+    emails.add_argument("--include-seen", action="store_true", help="keep postings scraped in earlier runs")
+    emails.add_argument("--restart", action="store_true", help="start the file over instead of resuming")
+
+    mail = commands.add_parser("send", parents=[common], help="email the contacts of a scraped file")
+    mail.add_argument("file", help="contacts file with Qualification and Email columns")
+    mail.add_argument("--smtp-server", default="smtp.gmail.com")
+    mail.add_argument("--smtp-port", type=int, default=587)
+    mail.add_argument("--sender-email", required=True)
+    mail.add_argument("--password-env", default="SMTP_PASSWORD", help="environment variable holding the password")
+    mail.add_argument("--no-tls", action="store_true")
+    mail.add_argument("--en-subject", required=True)
+    mail.add_argument("--en-message", required=True, help="file with the English message")
+    mail.add_argument("--en-attach")
+    mail.add_argument("--fr-subject", required=True)
+    mail.add_argument("--fr-message", required=True, help="file with the French message")
+    mail.add_argument("--fr-attach")
+    mail.add_argument("--limit", type=int, default=100, help="emails to send in this run, 0 for all pending")
+    mail.add_argument("--per-minute", type=float, help="emails handed to the server per minute")
+    mail.add_argument("--include-seen", action="store_true", help="also email addresses emailed in earlier runs")
+    mail.add_argument("--restart", action="store_true", help="start the file over instead of resuming")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    command, columns = COMMANDS[args.command]
+    output = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        return command(args, RowWriter(output, args.format, columns))
+    finally:
+        if args.output:
+            output.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
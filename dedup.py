@@ -0,0 +1,80 @@
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import re
+import sqlite3
+import time
+
+DEDUP_PATH = "dedup_index.sqlite3"
+
+POSTING_PATH_RE = re.compile(r'/jobsearch/jobposting/(\d+)')
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {"source", "fbclid", "gclid", "msclkid", "mc_cid", "mc_eid", "ref", "wbdisable"}
+
+
+def posting_id(url):
+    match = POSTING_PATH_RE.search(url or "")
+    return match.group(1) if match else None
+
+
+def canonical_url(url):
+    # Same posting, same string: no session ids, tracking params or fragments
+    url = str(url).strip()
+    parts = urlsplit(url)
+    if not parts.scheme or not parts.netloc:
+        return url
+    path = re.sub(r';jsessionid=[^/?#]*', '', parts.path, flags=re.IGNORECASE)
+    match = POSTING_PATH_RE.search(path)
+    if match:
+        # A Job Bank posting is fully identified by its number
+        return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), match.group(0), "", ""))
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith("utm_") and key.lower() != "jsessionid"
+    ]
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(sorted(query)), ""))
+
+
+def search_kind(url):
+    # Index namespace for the posting ids a search has already returned
+    return "search:" + canonical_url(url)
+
+
+def unique_jobs(rows):
+    # (Title, canonical Link) rows in first-seen order
+    seen = set()
+    unique = []
+    for row in rows:
+        link = canonical_url(row["Link"])
+        if link in seen:
+            continue
+        seen.add(link)
+        unique.append({**row, "Link": link})
+    return unique
+
+
+class DedupIndex:
+    # Persistent sets of posting URLs and email addresses already handled, shared across runs
+
+    def __init__(self, path=DEDUP_PATH):
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen (kind TEXT, key TEXT, first_seen REAL, PRIMARY KEY (kind, key))"
+        )
+        self.conn.commit()
+
+    def contains(self, kind, key):
+        return self.conn.execute("SELECT 1 FROM seen WHERE kind = ? AND key = ?", (kind, key)).fetchone() is not None
+
+    def keys(self, kind):
+        return {key for (key,) in self.conn.execute("SELECT key FROM seen WHERE kind = ?", (kind,))}
+
+    def add(self, kind, keys):
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO seen (kind, key, first_seen) VALUES (?, ?, ?)",
+            [(kind, key, now) for key in keys],
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,233 @@
+import atexit
+import os
+import queue
+import shutil
+import threading
+import time
+import traceback
+from metrics import no_metrics
+
+# Selenium is imported inside the functions that drive a browser, here and in search_scraper,
+# posting_scraper and wait_policy, so the crawler and the HTTP scrapes never load it.
+
+# Nothing we scrape needs images, media or web fonts
+SLIM_PREFS = {
+    "permissions.default.image": 2,
+    "media.autoplay.default": 5,
+    "media.autoplay.blocking_policy": 2,
+    "media.peerconnection.enabled": False,
+    "gfx.downloadable_fonts.enabled": False,
+    "browser.display.use_document_fonts": 0,
+    "browser.cache.disk.enable": False,
+    "browser.sessionhistory.max_entries": 2,
+    "toolkit.telemetry.enabled": False,
+    "datareporting.healthreport.uploadEnabled": False,
+    "app.update.enabled": False,
+}
+
+_service = {}
+
+
+def geckodriver_service():
+    # Resolve geckodriver once per process: $GECKODRIVER or PATH, otherwise Selenium Manager
+    from selenium.webdriver.firefox.service import Service
+    if "service" not in _service:
+        path = os.environ.get("GECKODRIVER") or shutil.which("geckodriver")
+        _service["service"] = path
+    path = _service["service"]
+    return Service(executable_path=path) if path else Service()
+
+
+def make_driver():
+    # Headless Firefox with a slim profile; "eager" returns once the DOM is ready,
+    # without waiting for stylesheets and subresources.
+    from selenium import webdriver
+    from selenium.webdriver.firefox.options import Options
+    options = Options()
+    options.add_argument("--headless")
+    options.page_load_strategy = "eager"
+    for name, value in SLIM_PREFS.items():
+        options.set_preference(name, value)
+    return webdriver.Firefox(options=options, service=geckodriver_service())
+
+
+def driver_alive(driver):
+    # Any command round-trip fails once the browser or geckodriver has died
+    try:
+        driver.current_url
+        return True
+    except Exception:
+        return False
+
+
+def quit_driver(driver):
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+
+class WarmDrivers:
+    # Idle browsers kept between runs so startup is off the critical path. acquire() hands out
+    # a healthy idle driver or starts one, release() parks it again after a reset. Drivers are
+    # recycled after max_uses runs or max_age seconds to keep their memory in check.
+
+    def __init__(self, driver_factory=make_driver, max_idle=4, max_uses=50, max_age=1800):
+        self.driver_factory = driver_factory
+        self.max_idle = max_idle
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self.idle = []
+        self.info = {}
+        self.warmer = None
+        self.lock = threading.Lock()
+
+    def _expired(self, driver):
+        created, uses = self.info.get(id(driver), (0, 0))
+        return uses >= self.max_uses or time.time() - created > self.max_age
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                driver = self.idle.pop() if self.idle else None
+            if driver is None:
+                driver = self.driver_factory()
+                with self.lock:
+                    self.info[id(driver)] = (time.time(), 0)
+                return driver
+            if driver_alive(driver) and not self._expired(driver):
+                return driver
+            self.discard(driver)
+
+    def release(self, driver):
+        with self.lock:
+            created, uses = self.info.get(id(driver), (time.time(), 0))
+            self.info[id(driver)] = (created, uses + 1)
+            keep = len(self.idle) < self.max_idle
+        if keep and not self._expired(driver):
+            try:
+                # Drop the previous run's DOM and session before parking the browser
+                driver.delete_all_cookies()
+                driver.get("about:blank")
+            except Exception:
+                keep = False
+        if not keep or self._expired(driver):
+            self.discard(driver)
+            return
+        with self.lock:
+            self.idle.append(driver)
+
+    def discard(self, driver):
+        with self.lock:
+            self.info.pop(id(driver), None)
+        quit_driver(driver)
+
+    def prewarm(self, count):
+        # Start browsers in the background until `count` are idle, one warm-up at a time
+        if self.warmer is not None and self.warmer.is_alive():
+            return self.warmer
+
+        def start():
+            try:
+                while True:
+                    with self.lock:
+                        if len(self.idle) >= min(count, self.max_idle):
+                            return
+                    driver = self.driver_factory()
+                    with self.lock:
+                        self.info[id(driver)] = (time.time(), 0)
+                        self.idle.append(driver)
+            except Exception:
+                traceback.print_exc()
+
+        self.warmer = threading.Thread(target=start, daemon=True)
+        self.warmer.start()
+        return self.warmer
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for driver in idle:
+            self.discard(driver)
+
+
+# Shared by every run in this process
+warm_drivers = WarmDrivers()
+atexit.register(warm_drivers.close)
+
+
+class DriverPool:
+    # N long-lived Firefox sessions pulling work items from one shared queue.
+    # task(driver, item) runs on a worker thread; a worker whose browser crashed
+    # restarts it and retries the item up to max_restarts times. Browsers come from and
+    # go back to `drivers`, a WarmDrivers; with drivers=None each run starts its own
+    # from driver_factory and quits them at the end.
+
+    def __init__(self, size=4, driver_factory=make_driver, max_restarts=2, metrics=no_metrics, drivers=None):
+        self.size = max(1, int(size))
+        self.driver_factory = driver_factory
+        self.max_restarts = max_restarts
+        self.metrics = metrics
+        self.drivers = drivers
+
+    def _worker(self, task, jobs, results):
+        driver = None
+        try:
+            while True:
+                try:
+                    index, item = jobs.get_nowait()
+                except queue.Empty:
+                    return
+
+                attempts = 0
+                while True:
+                    try:
+                        if driver is None:
+                            with self.metrics.timer("driver_start"):
+                                driver = self.drivers.acquire() if self.drivers is not None else self.driver_factory()
+                        results.put((index, task(driver, item), None))
+                        break
+                    except Exception as e:
+                        # Only a dead session is worth a restart, page errors go back to the caller
+                        if driver is not None and driver_alive(driver):
+                            results.put((index, None, e))
+                            break
+                        if driver is not None:
+                            if self.drivers is not None:
+                                self.drivers.discard(driver)
+                            else:
+                                quit_driver(driver)
+                            driver = None
+                        attempts += 1
+                        self.metrics.count("driver_restarts")
+                        if attempts > self.max_restarts:
+                            results.put((index, None, e))
+                            break
+        finally:
+            if driver is not None:
+                if self.drivers is not None:
+                    self.drivers.release(driver)
+                else:
+                    quit_driver(driver)
+
+    def imap(self, task, items):
+        # Yields (index, result, error) in completion order so the caller can
+        # update its progress from the main thread
+        items = list(items)
+        jobs = queue.Queue()
+        for index, item in enumerate(items):
+            jobs.put((index, item))
+        results = queue.Queue()
+
+        threads = [
+            threading.Thread(target=self._worker, args=(task, jobs, results), daemon=True)
+            for _ in range(min(self.size, len(items)))
+        ]
+        for thread in threads:
+            thread.start()
+
+        for _ in range(len(items)):
+            yield results.get()
+
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,99 @@
+import io
+import pandas as pd
+import xlsxwriter
+
+# Parquet needs pyarrow, the format is only offered when it is installed
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+MIME_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+class CsvExporter:
+    # Appends each chunk as it comes, the header is written once
+
+    def __init__(self, output, sheet_name=None):
+        self.output = io.TextIOWrapper(output, encoding="utf-8", newline="", write_through=True)
+        self.header = True
+
+    def write(self, frame):
+        frame.to_csv(self.output, index=False, header=self.header)
+        self.header = False
+
+    def close(self):
+        self.output.flush()
+        self.output.detach()
+
+
+class ParquetExporter:
+    # One row group per chunk, the schema is taken from the first chunk
+
+    def __init__(self, output, sheet_name=None):
+        if pq is None:
+            raise RuntimeError("Parquet export needs pyarrow, install it with `pip install pyarrow`.")
+        self.output = output
+        self.writer = None
+
+    def write(self, frame):
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.output, table.schema)
+        self.writer.write_table(table.cast(self.writer.schema))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class XlsxExporter:
+    # xlsxwriter in constant_memory mode flushes each row to disk instead of holding the workbook
+
+    def __init__(self, output, sheet_name="Sheet1"):
+        self.workbook = xlsxwriter.Workbook(output, {"constant_memory": True, "in_memory": False})
+        self.sheet = self.workbook.add_worksheet(sheet_name)
+        self.row = 0
+
+    def write(self, frame):
+        if self.row == 0:
+            self.sheet.write_row(0, 0, [str(column) for column in frame.columns])
+            self.row = 1
+        for values in frame.itertuples(index=False, name=None):
+            self.sheet.write_row(self.row, 0, ["" if pd.isna(value) else value for value in values])
+            self.row += 1
+
+    def close(self):
+        self.workbook.close()
+
+
+EXPORTERS = {
+    "csv": CsvExporter,
+    "parquet": ParquetExporter,
+    "xlsx": XlsxExporter,
+}
+
+
+def available_formats():
+    return [name for name in EXPORTERS if name != "parquet" or pq is not None]
+
+
+def export_frames(frames, fmt, output=None, sheet_name="Sheet1"):
+    # Writes a DataFrame or a stream of DataFrames in `fmt`. Returns the bytes when no
+    # output file is given.
+    if hasattr(frames, "columns"):
+        frames = [frames]
+    target = output if output is not None else io.BytesIO()
+    exporter = EXPORTERS[fmt](target, sheet_name=sheet_name)
+    try:
+        for frame in frames:
+            exporter.write(frame)
+    finally:
+        exporter.close()
+    if output is None:
+        return target.getvalue()
@@ -0,0 +1,105 @@
+from collections import OrderedDict
+import hashlib
+import threading
+import pandas as pd
+from ingest import iter_chunks, read_columns, read_rows, estimate_rows
+
+
+def content_key(upload):
+    return hashlib.sha1(upload.getvalue()).hexdigest()
+
+
+def upload_size(upload):
+    # Streamlit uploads know their size, getvalue() would copy the whole file to measure it
+    size = getattr(upload, "size", None)
+    return size if size is not None else len(upload.getvalue())
+
+
+def size_of(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return 0
+
+
+class FrameCache:
+    # Parsed uploads and derived artifacts (result frames, serialized downloads) kept across
+    # Streamlit reruns. Keys include the content hash of the upload, the least recently used
+    # entries are dropped once the total size passes max_bytes.
+
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total = 0
+        # content_key of recent uploads by Streamlit file_id, so a rerun hashes its upload once
+        self.keys = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key][0]
+
+    def put(self, key, value):
+        size = size_of(value)
+        with self.lock:
+            if key in self.entries:
+                self.total -= self.entries.pop(key)[1]
+            if size > self.max_bytes:
+                return value
+            self.entries[key] = (value, size)
+            self.total += size
+            while self.total > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.total -= evicted
+        return value
+
+    def get_or_build(self, key, build):
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, build())
+        return value
+
+    def key(self, upload):
+        file_id = getattr(upload, "file_id", None)
+        if file_id is None:
+            return content_key(upload)
+        with self.lock:
+            key = self.keys.get(file_id)
+            if key is not None:
+                self.keys.move_to_end(file_id)
+                return key
+        key = content_key(upload)
+        with self.lock:
+            self.keys[file_id] = key
+            while len(self.keys) > 32:
+                self.keys.popitem(last=False)
+        return key
+
+    def frame(self, upload):
+        # Whole upload parsed once per content; None when it would not fit the budget
+        if upload_size(upload) * 4 > self.max_bytes:
+            return None
+        key = ("frame", self.key(upload))
+        frame = self.get(key)
+        if frame is None:
+            chunks = list(iter_chunks(upload, upload.name))
+            frame = self.put(key, pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame())
+        return frame
+
+    # Pagination helpers, O(page) on a cached frame and streaming for uploads too big to cache
+
+    def columns(self, upload):
+        frame = self.frame(upload)
+        return list(frame.columns) if frame is not None else read_columns(upload, upload.name)
+
+    def row_count(self, upload):
+        frame = self.frame(upload)
+        return len(frame) if frame is not None else estimate_rows(upload, upload.name)
+
+    def rows(self, upload, start, stop):
+        frame = self.frame(upload)
+        return frame.iloc[start:stop] if frame is not None else read_rows(upload, upload.name, start, stop)
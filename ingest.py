@@ -0,0 +1,146 @@
+import csv
+import io
+import os
+import pandas as pd
+from openpyxl import load_workbook
+
+# Parquet uploads need pyarrow
+try:
+    from pyarrow.parquet import ParquetFile
+except ImportError:
+    ParquetFile = None
+
+CHUNK_SIZE = 1000
+
+
+def file_type(file_name):
+    return file_name.rsplit('.', 1)[-1].lower()
+
+
+def rewind(source):
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return source
+
+
+def iter_xlsx_chunks(source, chunksize):
+    # openpyxl in read-only mode streams rows instead of building the whole workbook
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(name) if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+        batch = []
+        for values in rows:
+            if all(value is None for value in values):
+                continue
+            batch.append(values)
+            if len(batch) >= chunksize:
+                yield pd.DataFrame(batch, columns=columns)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=columns)
+    finally:
+        workbook.close()
+
+
+def iter_chunks(source, file_name, chunksize=CHUNK_SIZE):
+    # Yields DataFrames of at most chunksize rows so processing can start on the first one
+    kind = file_type(file_name)
+    rewind(source)
+    if kind == "csv":
+        yield from pd.read_csv(source, chunksize=chunksize)
+    elif kind == "txt":
+        yield from pd.read_csv(source, delimiter="\t", chunksize=chunksize)
+    elif kind == "xlsx":
+        yield from iter_xlsx_chunks(source, chunksize)
+    elif kind == "parquet" and ParquetFile is not None:
+        for batch in ParquetFile(source).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    elif kind == "xls":
+        # The legacy format has no streaming reader
+        yield pd.read_excel(source)
+    else:
+        raise ValueError("Unsupported file type.")
+
+
+def read_columns(source, file_name):
+    # Header of the file without reading past the first chunk
+    for chunk in iter_chunks(source, file_name, chunksize=1):
+        return list(chunk.columns)
+    return []
+
+
+def read_rows(source, file_name, start, stop):
+    # Rows [start, stop) reading only as many chunks as needed
+    frames = []
+    offset = 0
+    for chunk in iter_chunks(source, file_name):
+        if offset + len(chunk) > start:
+            frames.append(chunk.iloc[max(0, start - offset):stop - offset])
+        offset += len(chunk)
+        if offset >= stop:
+            break
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames)
+
+
+def estimate_rows(source, file_name):
+    # Cheap row count for progress bars, quoted line breaks in CSV may inflate it slightly
+    kind = file_type(file_name)
+    if kind in ("csv", "txt"):
+        data = rewind(source).read()
+        rewind(source)
+        lines = data.count(b"\n") + (0 if data.endswith(b"\n") else 1)
+        return max(0, lines - 1)
+    if kind == "parquet" and ParquetFile is not None:
+        rows = ParquetFile(rewind(source)).metadata.num_rows
+        rewind(source)
+        return rows
+    if kind == "xlsx":
+        workbook = load_workbook(rewind(source), read_only=True)
+        try:
+            return max(0, (workbook.active.max_row or 1) - 1)
+        finally:
+            workbook.close()
+            rewind(source)
+    return sum(len(chunk) for chunk in iter_chunks(source, file_name))
+
+
+class ResultWriter:
+    # Append-only CSV of result rows, the header is written once when the file is new
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = list(columns)
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "a", newline="", encoding="utf-8")
+        self.writer = csv.DictWriter(self.file, fieldnames=self.columns, extrasaction="ignore")
+        if new_file:
+            self.writer.writeheader()
+
+    def write_rows(self, rows):
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def frame_to_csv_bytes(chunks):
+    # Serializes a stream of DataFrames to CSV without concatenating them
+    output = io.StringIO()
+    header = True
+    for chunk in chunks:
+        chunk.to_csv(output, index=False, header=header)
+        header = False
+    return output.getvalue().encode("utf-8")
@@ -0,0 +1,207 @@
+import hashlib
+import json
+import sqlite3
+import time
+
+QUEUE_PATH = "job_queue.sqlite3"
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+# Job states of background runs
+QUEUED = "queued"
+RUNNING = "running"
+
+# A queued or running job that has not reported progress for this long is presumed dead
+# (its worker was killed) and no longer keeps its run to itself
+STALE_AFTER = 15 * 60
+
+
+def run_id_for(kind, content):
+    # The same upload for the same kind of job resumes the same run
+    return run_id_for_key(kind, hashlib.sha1(content).hexdigest())
+
+
+def run_id_for_key(kind, key):
+    # Same run id from an already computed SHA-1 of the content (FrameCache.key)
+    return f"{kind}-{key[:16]}"
+
+
+class JobQueue:
+    # Durable per-item state for scrape and send runs. Every state change is committed
+    # right away, so a run that dies at item 3,100 resumes at 3,101. Failed items are
+    # handed out again until they have failed max_retries times.
+
+    def __init__(self, path=QUEUE_PATH, max_retries=3):
+        self.max_retries = max_retries
+        # The UI and the background worker share the file, writers wait for each other
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            " run_id TEXT, position INTEGER, key TEXT, payload TEXT,"
+            " state TEXT, retries INTEGER DEFAULT 0, result TEXT, error TEXT, updated REAL,"
+            " PRIMARY KEY (run_id, position))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS items_state ON items (run_id, state)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " job_id TEXT PRIMARY KEY, kind TEXT, run_id TEXT, state TEXT,"
+            " done INTEGER DEFAULT 0, total INTEGER DEFAULT 0, message TEXT, error TEXT, updated REAL, metrics TEXT)"
+        )
+        # Job tables created before the timing report have no metrics column yet
+        if "metrics" not in {column for _, column, *_ in self.conn.execute("PRAGMA table_info(jobs)")}:
+            self.conn.execute("ALTER TABLE jobs ADD COLUMN metrics TEXT")
+        self.conn.commit()
+
+    def enqueue(self, run_id, items, start=0):
+        # items are (key, payload) pairs; positions already in the queue keep their state
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO items (run_id, position, key, payload, state, updated) VALUES (?, ?, ?, ?, ?, ?)",
+            [(run_id, start + offset, key, json.dumps(payload), PENDING, now) for offset, (key, payload) in enumerate(items)],
+        )
+        self.conn.commit()
+
+    def pending(self, run_id, start=0, stop=None, limit=None):
+        # Items still to do in [start, stop), in position order
+        query = (
+            "SELECT position, key, payload FROM items WHERE run_id = ? AND position >= ? AND position < ?"
+            " AND (state = ? OR (state = ? AND retries < ?)) ORDER BY position"
+        )
+        params = [run_id, start, stop if stop is not None else 2 ** 62, PENDING, FAILED, self.max_retries]
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return [(position, key, json.loads(payload)) for position, key, payload in self.conn.execute(query, params)]
+
+    def record_results(self, run_id, rows, start=0):
+        # Items that are finished as they are created, keyed by Link: the rows a search produces
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO items (run_id, position, key, payload, state, result, updated)"
+            " VALUES (?, ?, ?, '{}', ?, ?, ?)",
+            [(run_id, start + offset, row["Link"], DONE, json.dumps(row), now) for offset, row in enumerate(rows)],
+        )
+        self.conn.commit()
+
+    def _finish(self, run_id, position, state, result=None, error=None):
+        self.conn.execute(
+            "UPDATE items SET state = ?, result = ?, error = ?, updated = ?,"
+            " retries = retries + (CASE WHEN ? = ? THEN 1 ELSE 0 END)"
+            " WHERE run_id = ? AND position = ?",
+            (state, json.dumps(result) if result is not None else None, error, time.time(),
+             state, FAILED, run_id, position),
+        )
+        self.conn.commit()
+
+    def mark_done(self, run_id, position, result=None):
+        self._finish(run_id, position, DONE, result=result)
+
+    def mark_failed(self, run_id, position, error):
+        self._finish(run_id, position, FAILED, error=str(error))
+
+    def mark_skipped(self, run_id, position, reason):
+        self._finish(run_id, position, SKIPPED, error=reason)
+
+    def counts(self, run_id):
+        counts = {PENDING: 0, DONE: 0, FAILED: 0, SKIPPED: 0}
+        for state, count in self.conn.execute(
+            "SELECT state, COUNT(*) FROM items WHERE run_id = ? GROUP BY state", (run_id,)
+        ):
+            counts[state] = count
+        return counts
+
+    def results(self, run_id):
+        # Results of the finished items in input order, including earlier sessions of the run
+        return [
+            json.loads(result)
+            for (result,) in self.conn.execute(
+                "SELECT result FROM items WHERE run_id = ? AND state = ? AND result IS NOT NULL ORDER BY position",
+                (run_id, DONE),
+            )
+        ]
+
+    def latest_results(self, run_id, limit):
+        # The `limit` most recently finished results, in input order
+        rows = self.conn.execute(
+            "SELECT position, result FROM items WHERE run_id = ? AND state = ? AND result IS NOT NULL"
+            " ORDER BY updated DESC LIMIT ?",
+            (run_id, DONE, limit),
+        ).fetchall()
+        return [json.loads(result) for _, result in sorted(rows)]
+
+    def keys(self, run_id, state):
+        return [key for (key,) in self.conn.execute(
+            "SELECT key FROM items WHERE run_id = ? AND state = ? ORDER BY position", (run_id, state)
+        )]
+
+    def failures(self, run_id):
+        return self.conn.execute(
+            "SELECT key, error FROM items WHERE run_id = ? AND state = ? ORDER BY position", (run_id, FAILED)
+        ).fetchall()
+
+    def create_job(self, job_id, kind, run_id):
+        self.conn.execute(
+            "INSERT INTO jobs (job_id, kind, run_id, state, updated) VALUES (?, ?, ?, ?, ?)",
+            (job_id, kind, run_id, QUEUED, time.time()),
+        )
+        self.conn.commit()
+
+    def update_job(self, job_id, state=None, done=None, total=None, message=None, error=None, metrics=None):
+        fields = {"state": state, "done": done, "total": total, "message": message, "error": error, "metrics": metrics}
+        fields = {name: value for name, value in fields.items() if value is not None}
+        fields["updated"] = time.time()
+        self.conn.execute(
+            f"UPDATE jobs SET {', '.join(f'{name} = ?' for name in fields)} WHERE job_id = ?",
+            (*fields.values(), job_id),
+        )
+        self.conn.commit()
+
+    def active_job(self, run_id, stale_after=STALE_AFTER):
+        # Live queued or running job of the run, or None
+        row = self.conn.execute(
+            "SELECT job_id FROM jobs WHERE run_id = ? AND state IN (?, ?) AND updated > ? ORDER BY updated DESC LIMIT 1",
+            (run_id, QUEUED, RUNNING, time.time() - stale_after),
+        ).fetchone()
+        return row[0] if row else None
+
+    def claim_run(self, job_id, run_id, stale_after=STALE_AFTER):
+        # Marks the job running unless another live job of the same run is. One statement, so
+        # two workers (or the worker and the CLI) cannot both claim the run
+        now = time.time()
+        cursor = self.conn.execute(
+            "UPDATE jobs SET state = ?, updated = ? WHERE job_id = ? AND NOT EXISTS ("
+            " SELECT 1 FROM jobs WHERE run_id = ? AND state = ? AND job_id != ? AND updated > ?)",
+            (RUNNING, now, job_id, run_id, RUNNING, job_id, now - stale_after),
+        )
+        self.conn.commit()
+        return cursor.rowcount == 1
+
+    def abandon(self, job_ids, error):
+        # Fails the jobs among job_ids that never finished, their worker is gone
+        self.conn.executemany(
+            "UPDATE jobs SET state = ?, error = ?, updated = ? WHERE job_id = ? AND state IN (?, ?)",
+            [(FAILED, error, time.time(), job_id, QUEUED, RUNNING) for job_id in job_ids],
+        )
+        self.conn.commit()
+
+    def get_job(self, job_id):
+        row = self.conn.execute(
+            "SELECT job_id, kind, run_id, state, done, total, message, error, metrics FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(("job_id", "kind", "run_id", "state", "done", "total", "message", "error", "metrics"), row))
+        job["metrics"] = json.loads(job["metrics"]) if job["metrics"] else None
+        return job
+
+    def reset(self, run_id):
+        self.conn.execute("DELETE FROM items WHERE run_id = ?", (run_id,))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
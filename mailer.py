@@ -0,0 +1,142 @@
+import smtplib
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.mime.base import MIMEBase
+from email import encoders
+from metrics import no_metrics
+from scheduler import default_scheduler, smtp_outcome, FAILED, THROTTLED
+
+# Errors after which the connection is gone and worth one reconnect
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+class PreparedAttachment:
+    # Read and base64-encoded once, the same MIME part is attached to every message
+
+    def __init__(self, name, data):
+        self.name = name
+        self.part = MIMEBase('application', 'octet-stream')
+        self.part.set_payload(data)
+        encoders.encode_base64(self.part)
+        self.part.add_header('Content-Disposition', f"attachment; filename= {name}")
+
+
+class MessageTemplate:
+    # Subject, body and attachment built once per language, only the recipient changes per message
+
+    def __init__(self, sender_email, subject, message, attachment=None):
+        self.sender_email = sender_email
+        self.subject = subject
+        self.body = MIMEText(message, 'plain')
+        self.attachment = attachment
+
+    def render(self, recipient_email):
+        msg = MIMEMultipart()
+        msg['From'] = self.sender_email
+        msg['To'] = recipient_email
+        msg['Subject'] = self.subject
+        msg.attach(self.body)
+        if self.attachment is not None:
+            msg.attach(self.attachment.part)
+        return msg
+
+
+def reply_code(error, recipient_email):
+    # SMTP reply code of a rejection, None when the server gave none
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return error.recipients.get(recipient_email, (None,))[0]
+    return getattr(error, "smtp_code", None)
+
+
+class ConnectionFailed(Exception):
+    # Connecting, STARTTLS or login failed. Nothing else in the batch can go out, and logging in
+    # again for every recipient is how an account gets locked
+    pass
+
+
+class Mailer:
+    # One authenticated SMTP connection reused for a whole batch, reopened when it drops.
+    # Every message takes a slot of the server's budget in `scheduler`; 4xx replies slow the
+    # server down and the message is tried again up to `max_retries` times.
+
+    def __init__(self, smtp_server, smtp_port, sender_email, sender_password, use_tls=True, timeout=30,
+                 metrics=no_metrics, scheduler=default_scheduler, max_retries=2):
+        self.smtp_server = smtp_server
+        self.smtp_port = int(smtp_port)
+        self.sender_email = sender_email
+        self.sender_password = sender_password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.metrics = metrics
+        self.scheduler = scheduler
+        self.max_retries = max_retries
+        self.server = None
+
+    def connect(self):
+        self.close()
+        server = None
+        try:
+            with self.metrics.timer("smtp_connect"):
+                server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.timeout)
+            if self.use_tls:
+                with self.metrics.timer("smtp_starttls"):
+                    server.starttls()  # Secure the connection
+            if self.sender_password:
+                with self.metrics.timer("smtp_login"):
+                    server.login(self.sender_email, self.sender_password)
+        except Exception as e:
+            # Do not leave the half-opened socket behind
+            if server is not None:
+                server.close()
+            raise ConnectionFailed(f"Could not connect to {self.smtp_server}:{self.smtp_port}: {e}") from e
+        self.server = server
+
+    def send(self, recipient_email, msg):
+        # Returns (delivered, error) for this recipient. Raises ConnectionFailed when the server
+        # cannot be connected or logged in to (counted as a failure of the host), and CircuitOpen
+        # once the server has failed too often to keep trying
+        payload = msg.as_string()
+        reconnected = False
+        throttled = 0
+        while True:
+            with self.scheduler.slot(self.smtp_server, self.metrics) as slot:
+                try:
+                    if self.server is None:
+                        self.connect()
+                    with self.metrics.timer("smtp_send"):
+                        refused = self.server.sendmail(self.sender_email, recipient_email, payload)
+                    if refused:
+                        return False, str(refused.get(recipient_email, refused))
+                    return True, None
+                except RECONNECT_ERRORS as e:
+                    slot.report(FAILED)
+                    self.metrics.count("smtp_reconnects")
+                    self.server = None
+                    if reconnected:
+                        return False, str(e)
+                    reconnected = True
+                except smtplib.SMTPException as e:
+                    # Rejected by the server, the connection itself is still usable
+                    slot.report(smtp_outcome(reply_code(e, recipient_email) or 0))
+                    if self.server is not None:
+                        try:
+                            self.server.rset()
+                        except Exception:
+                            self.server = None
+                    if slot.outcome != THROTTLED or throttled >= self.max_retries:
+                        return False, str(e)
+                    throttled += 1
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except Exception:
+                pass
+            self.server = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
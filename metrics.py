@@ -0,0 +1,93 @@
+from collections import deque
+from contextlib import contextmanager
+import json
+import threading
+import time
+
+
+class Metrics:
+    # Per-run timers and counters. Each stage keeps its last `window` durations for the
+    # percentiles plus running totals; thread-safe so pool workers can share one instance.
+
+    def __init__(self, window=10000, enabled=True):
+        self.window = window
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def record(self, stage, seconds, items=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            entry = self.stages.get(stage)
+            if entry is None:
+                entry = self.stages[stage] = {"samples": deque(maxlen=self.window), "count": 0, "items": 0, "total": 0.0}
+            entry["samples"].append(seconds)
+            entry["count"] += 1
+            entry["items"] += items
+            entry["total"] += seconds
+
+    @contextmanager
+    def timer(self, stage, items=1):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, items)
+
+    def iterate(self, iterable, stage):
+        # Times each step of a lazy iterator (file chunks, result pages...)
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                value = next(iterator)
+            except StopIteration:
+                return
+            self.record(stage, time.perf_counter() - start, len(value) if hasattr(value, "__len__") else 1)
+            yield value
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def report(self):
+        # {"elapsed", "stages": {stage: count/items/total/p50/p95/max/items_per_sec}, "counters"}
+        with self.lock:
+            stages = {stage: (sorted(entry["samples"]), entry["count"], entry["items"], entry["total"])
+                      for stage, entry in self.stages.items()}
+            counters = dict(self.counters)
+
+        def percentile(samples, q):
+            return samples[min(len(samples) - 1, int(q * len(samples)))] if samples else 0.0
+
+        return {
+            "elapsed": round(time.perf_counter() - self.started, 3),
+            "stages": {
+                stage: {
+                    "count": count,
+                    "items": items,
+                    "total": round(total, 3),
+                    "p50": round(percentile(samples, 0.50), 4),
+                    "p95": round(percentile(samples, 0.95), 4),
+                    "max": round(samples[-1], 4) if samples else 0.0,
+                    "items_per_sec": round(items / total, 2) if total else None,
+                }
+                for stage, (samples, count, items, total) in sorted(stages.items())
+            },
+            "counters": counters,
+        }
+
+    def to_json(self):
+        return json.dumps(self.report(), indent=2)
+
+
+# Default for callers that do not collect metrics, every call is a no-op
+no_metrics = Metrics(enabled=False)
@@ -0,0 +1,84 @@
+import hashlib
+import sqlite3
+import time
+from classify import first_email, METHOD_EMAIL, METHOD_UNKNOWN
+
+CACHE_PATH = "posting_cache.sqlite3"
+
+
+def content_hash(row):
+    content = "\x1f".join(str(row.get(key, "")) for key in ("Title", "Qualification", "Email", "Method"))
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+class PostingCache:
+    # Scraped postings keyed by URL. Entries younger than `ttl` seconds are served as is,
+    # older ones are re-scraped and only rewritten when their content changed.
+    # Entries older than `max_age` are evicted and the table is trimmed to `max_entries`,
+    # oldest fetch first.
+
+    def __init__(self, path=CACHE_PATH, ttl=24 * 3600, max_age=7 * 24 * 3600, max_entries=100000):
+        self.ttl = ttl
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS postings ("
+            " link TEXT PRIMARY KEY, title TEXT, qualification TEXT, email TEXT,"
+            " fetched_at REAL, content_hash TEXT, method TEXT)"
+        )
+        if "method" not in {column for _, column, *_ in self.conn.execute("PRAGMA table_info(postings)")}:
+            self.conn.execute("ALTER TABLE postings ADD COLUMN method TEXT")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS postings_fetched_at ON postings (fetched_at)")
+        self.conn.commit()
+
+    def fresh(self, link):
+        # True when get() would serve link, without counting a hit or a miss
+        entry = self.conn.execute("SELECT fetched_at FROM postings WHERE link = ?", (link,)).fetchone()
+        return entry is not None and time.time() - entry[0] <= self.ttl
+
+    def get(self, link):
+        # Fresh cached row for link, or None when it has to be scraped
+        entry = self.conn.execute(
+            "SELECT title, qualification, email, fetched_at, method FROM postings WHERE link = ?", (link,)
+        ).fetchone()
+        if entry is None or time.time() - entry[3] > self.ttl:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Entries cached before the method column only ever held email scrapes
+        method = entry[4] or (METHOD_EMAIL if first_email(entry[2]) else METHOD_UNKNOWN)
+        return {'Title': entry[0], 'Link': link, 'Qualification': entry[1], 'Email': entry[2], 'Method': method}
+
+    def put(self, row):
+        digest = content_hash(row)
+        now = time.time()
+        previous = self.conn.execute("SELECT content_hash FROM postings WHERE link = ?", (row['Link'],)).fetchone()
+        if previous is not None and previous[0] == digest:
+            self.revalidated += 1
+            self.conn.execute("UPDATE postings SET fetched_at = ? WHERE link = ?", (now, row['Link']))
+        else:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO postings (link, title, qualification, email, fetched_at, content_hash, method)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (row['Link'], row['Title'], row['Qualification'], row['Email'], now, digest, row.get('Method')),
+            )
+        self.conn.commit()
+
+    def evict(self):
+        self.conn.execute("DELETE FROM postings WHERE fetched_at < ?", (time.time() - self.max_age,))
+        self.conn.execute(
+            "DELETE FROM postings WHERE link IN ("
+            " SELECT link FROM postings ORDER BY fetched_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        self.conn.commit()
+
+    def stats(self):
+        return f"cache: {self.hits} hits, {self.misses} misses"
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,203 @@
+from contextlib import contextmanager
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup
+from urllib.parse import urljoin, urlsplit
+import html
+import re
+import threading
+from metrics import no_metrics
+from scheduler import default_scheduler, status_outcome, retry_after_seconds, THROTTLED
+from classify import first_email, application_method, page_method, APPLY_LINK_PATTERN, METHOD_EMAIL, METHOD_UNKNOWN
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64; rv:128.0) Gecko/20100101 Firefox/128.0",
+    "Accept-Language": "en-CA,en;q=0.8,fr-CA;q=0.5",
+}
+
+# lxml is several times faster than the stdlib parser, use it when it is installed
+try:
+    import lxml  # noqa: F401
+    PARSER = "lxml"
+except ImportError:
+    PARSER = "html.parser"
+
+# The how to apply fragment inside the JSF partial response
+HOWTOAPPLY_UPDATE_RE = re.compile(r'<update id="[^"]*howtoapply[^"]*"><!\[CDATA\[(.*?)\]\]></update>', re.DOTALL)
+APPLY_LINK_RE = re.compile(APPLY_LINK_PATTERN, re.IGNORECASE)
+
+def make_session(pool_size=10):
+    session = requests.Session()
+    # One retry for a dropped connection; 429/503 with Retry-After are left to the scheduler
+    # instead of urllib3 sleeping on them while the host's slot is held
+    retries = Retry(total=1, respect_retry_after_header=False)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(HEADERS)
+    return session
+
+
+class SessionPool:
+    # Keep-alive sessions shared by every scrape in the process, so connections outlive the
+    # thread pools each chunk starts. A session is checked out for one posting, Job Bank binds
+    # the apply view state to its cookie. Sessions beyond max_idle are closed when returned.
+
+    def __init__(self, max_idle=16):
+        self.max_idle = max_idle
+        self.idle = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def session(self):
+        with self.lock:
+            session = self.idle.pop() if self.idle else None
+        if session is None:
+            session = make_session()
+        try:
+            yield session
+        finally:
+            with self.lock:
+                keep = len(self.idle) < self.max_idle
+                if keep:
+                    self.idle.append(session)
+            if not keep:
+                session.close()
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for session in idle:
+            session.close()
+
+
+default_sessions = SessionPool()
+
+
+def request(method, url, scheduler=default_scheduler, metrics=no_metrics, retries=2, session=None, **kwargs):
+    # One request within the host's budget. 429 and 5xx replies slow the host down and are
+    # retried once the scheduler lets the host go again; other errors raise as usual.
+    if session is None:
+        with default_sessions.session() as session:
+            return request(method, url, scheduler, metrics, retries, session=session, **kwargs)
+    host = urlsplit(url).netloc
+    for attempt in range(retries + 1):
+        with scheduler.slot(host, metrics) as slot:
+            response = session.request(method, url, **kwargs)
+            slot.report(status_outcome(response.status_code), retry_after_seconds(response.headers.get("Retry-After")))
+        if slot.outcome != THROTTLED or attempt == retries:
+            response.raise_for_status()
+            return response
+
+
+def find_email(text):
+    return first_email(html.unescape(text))
+
+
+def external_apply_link(soup, page_url):
+    # True when the page sends applicants to another site instead of the apply button
+    host = urlsplit(page_url).netloc
+    for anchor in soup.find_all("a", href=True):
+        target = urlsplit(urljoin(page_url, anchor["href"]))
+        if target.scheme in ("http", "https") and target.netloc != host and APPLY_LINK_RE.search(anchor.get_text(" ")):
+            return True
+    return False
+
+
+def apply_form_request(soup, page_url):
+    # Rebuild the JSF ajax request the "applynowbutton" click sends, returns (url, data) or None
+    button = soup.find(id="applynowbutton")
+    if button is None:
+        return None
+    form = button.find_parent("form")
+    if form is None:
+        return None
+
+    data = {}
+    for field in form.find_all("input"):
+        name = field.get("name")
+        if name and field.get("type", "text") in ("hidden", "text"):
+            data[name] = field.get("value", "")
+
+    source = button.get("name") or button.get("id")
+    form_id = form.get("id") or form.get("name")
+    if form_id:
+        data.setdefault(form_id, form_id)
+    data.update({
+        source: source,
+        "javax.faces.source": source,
+        "javax.faces.partial.ajax": "true",
+        "javax.faces.partial.event": "click",
+        "javax.faces.partial.execute": source,
+        "javax.faces.partial.render": "howtoapply",
+        "javax.faces.behavior.event": "action",
+    })
+    return urljoin(page_url, form.get("action") or page_url), data
+
+
+def fetch_posting(title, link, timeout=15, scheduler=default_scheduler, metrics=no_metrics, sessions=default_sessions):
+    # Browserless scrape of one posting, returns None when the page needs a real browser.
+    # Postings that do not take email applications are classified from the page and returned
+    # without the apply round trip.
+    with sessions.session() as session:
+        return fetch_posting_with(session, title, link, timeout, scheduler, metrics)
+
+
+def fetch_posting_with(session, title, link, timeout, scheduler, metrics):
+    # The GET and the apply POST go over the same session, the view state is bound to its cookie
+    response = request("GET", link, scheduler, metrics, session=session, timeout=timeout)
+    soup = BeautifulSoup(response.text, PARSER)
+
+    qualification_elem = soup.find("p", attrs={"property": "qualification"})
+    if qualification_elem is None:
+        qualification = "No qualification found"
+    else:
+        qualification = qualification_elem.get_text(" ", strip=True)
+
+    def result(email, method):
+        return {
+            'Title': title,
+            'Link': link,
+            'Qualification': qualification,
+            'Email': email or "No email found",
+            'Method': method,
+        }
+
+    if soup.find(id="applynowbutton") is None:
+        # Expired, or applications go through the employer's site
+        method = page_method(soup.get_text(" "), external_apply_link(soup, response.url))
+        return None if method == METHOD_UNKNOWN else result(None, method)
+
+    # Some postings already render the how to apply section inline
+    email = None
+    how_to_apply = soup.find(id="howtoapply")
+    if how_to_apply is not None:
+        email = find_email(how_to_apply.decode_contents())
+
+    if email is None:
+        apply_request = apply_form_request(soup, response.url)
+        if apply_request is None:
+            return None
+        url, data = apply_request
+        apply_response = request(
+            "POST",
+            url,
+            scheduler,
+            metrics,
+            session=session,
+            data=data,
+            headers={"Faces-Request": "partial/ajax", "X-Requested-With": "XMLHttpRequest", "Referer": response.url},
+            timeout=timeout,
+        )
+        # The partial response only carries the rendered how to apply fragment,
+        # anything else (an error page, an expired view state) is left to the browser
+        update = HOWTOAPPLY_UPDATE_RE.search(apply_response.text)
+        if update is None:
+            return None
+        fragment = update.group(1)
+        email = find_email(fragment)
+        if email is None:
+            return result(None, application_method(BeautifulSoup(fragment, PARSER).get_text(" ")))
+
+    return result(email, METHOD_EMAIL)
@@ -0,0 +1,159 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+from driver_pool import DriverPool, warm_drivers
+from posting_http import fetch_posting
+from classify import first_email, application_method, page_method, APPLY_LINK_PATTERN, METHOD_EMAIL, METHOD_UNKNOWN
+from wait_policy import default_policy, howtoapply_populated
+from metrics import no_metrics
+from scheduler import default_scheduler
+
+# One round trip after load: [has apply button, qualification text or null,
+# has an off-site apply link, page text when there is no apply button]
+PAGE_SCRIPT = """
+var button = document.getElementById('applynowbutton');
+var qualification = document.querySelector("p[property='qualification']");
+var pattern = new RegExp(arguments[0], 'i');
+var offsite = Array.prototype.some.call(document.querySelectorAll('a[href]'), function (a) {
+    return /^https?:$/.test(a.protocol) && a.host !== location.host && pattern.test(a.textContent);
+});
+return [button !== null, qualification ? qualification.innerText : null, offsite,
+        button ? '' : document.body.innerText];
+"""
+
+
+def scrape_posting(driver, title, link, policy=default_policy, metrics=no_metrics, scheduler=default_scheduler):
+    # Scrape one Job Bank posting, returns the row and any non-fatal warnings.
+    from selenium.webdriver.common.by import By
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.support import expected_conditions as EC
+    warnings = []
+    site = urlsplit(link).netloc
+    with scheduler.slot(site, metrics), metrics.timer("page_load"):
+        driver.get(link)
+
+    # Classify the loaded page before waiting on anything, only postings with an apply
+    # button can take email applications
+    with metrics.timer("classify_page"):
+        has_button, qualification, offsite, page_text = driver.execute_script(PAGE_SCRIPT, APPLY_LINK_PATTERN)
+    qualification = qualification or "No qualification found"
+    if not has_button:
+        metrics.count("fast_fail")
+        row = {
+            'Title': title,
+            'Link': link,
+            'Qualification': qualification,
+            'Email': "No email found",
+            'Method': page_method(page_text, offsite),
+        }
+        return row, warnings
+
+    # Find and click the apply button
+    try:
+        with metrics.timer("wait_applynowbutton"):
+            apply_button = policy.wait(driver, EC.element_to_be_clickable((By.ID, "applynowbutton")), "applynowbutton", site)
+    except Exception as e:
+        warnings.append(f"Could not click apply button for {link}: {e}")
+    else:
+        # The click is one request to the site, it holds a slot until the how to apply section
+        # rendered. A slow render is not a failure of the host, it does not count toward its breaker
+        with scheduler.slot(site, metrics):
+            try:
+                apply_button.click()
+                with metrics.timer("wait_howtoapply"):
+                    policy.wait(driver, howtoapply_populated, "howtoapply", site)
+            except TimeoutException:
+                metrics.count("wait_timeouts")
+            except Exception as e:
+                warnings.append(f"Could not click apply button for {link}: {e}")
+
+    # Find the how to apply div and extract email
+    try:
+        with metrics.timer("extract"):
+            how_to_apply_div = driver.find_element(By.ID, "howtoapply")
+            div_text = how_to_apply_div.text
+            email = first_email(div_text)
+            method = METHOD_EMAIL if email else application_method(div_text)
+            email = email or "No email found"
+    except Exception as e:
+        email = f"Error finding email: {e}"
+        method = METHOD_UNKNOWN
+
+    row = {
+        'Title': title,
+        'Link': link,
+        'Qualification': qualification,
+        'Email': email,
+        'Method': method,
+    }
+    return row, warnings
+
+
+def scrape_postings(rows, workers=4, on_progress=None, http_workers=8, cache=None, metrics=no_metrics,
+                    drivers=warm_drivers, scheduler=default_scheduler):
+    # Scrape (title, link) pairs, results come back in input order.
+    # Links with a fresh entry in `cache` are not fetched again. Every other posting is
+    # tried over plain HTTP first, only the pages where that finds nothing are rendered
+    # by the browser pool.
+    # on_progress(done, total, index, row, error, warnings) is called from the calling thread.
+    rows = list(rows)
+    total = len(rows)
+    scraped = [None] * total
+    progress = {"done": 0}
+
+    def finish(index, row, error=None, warnings=(), fetched=True):
+        scraped[index] = row
+        # Only fetched rows are written back, putting a hit would restart its TTL
+        if fetched and cache is not None and row is not None and not str(row['Email']).startswith("Error"):
+            cache.put(row)
+        progress["done"] += 1
+        if on_progress:
+            on_progress(progress["done"], total, index, row, error, list(warnings))
+
+    pending = []
+    for index, (title, link) in enumerate(rows):
+        cached = cache.get(link) if cache is not None else None
+        if cached is None:
+            pending.append(index)
+        else:
+            cached['Title'] = title
+            metrics.count("cache_hits")
+            finish(index, cached, fetched=False)
+
+    def fetch(title, link):
+        with metrics.timer("http_fetch"):
+            return fetch_posting(title, link, scheduler=scheduler, metrics=metrics)
+
+    fallback = []
+    with ThreadPoolExecutor(max_workers=max(1, http_workers)) as executor:
+        futures = {executor.submit(fetch, *rows[index]): index for index in pending}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                row = future.result()
+            except Exception:
+                metrics.count("http_errors")
+                row = None
+            if row is None:
+                fallback.append(index)
+            else:
+                finish(index, row)
+
+    if fallback:
+        fallback.sort()
+        metrics.count("browser_fallbacks", len(fallback))
+        pool = DriverPool(size=workers, metrics=metrics, drivers=drivers)
+
+        def task(driver, row):
+            with metrics.timer("browser_posting"):
+                return scrape_posting(driver, *row, metrics=metrics, scheduler=scheduler)
+
+        for position, result, error in pool.imap(task, [rows[index] for index in fallback]):
+            if error is None:
+                row, warnings = result
+                finish(fallback[position], row, warnings=warnings)
+            else:
+                finish(fallback[position], None, error)
+
+    if cache is not None:
+        cache.evict()
+    return [row for row in scraped if row is not None]
@@ -0,0 +1,213 @@
+from contextlib import contextmanager
+import threading
+import time
+from metrics import no_metrics
+
+# Outcomes a caller reports for one request to a host
+OK = "ok"
+THROTTLED = "throttled"
+FAILED = "failed"
+
+# HTTP statuses that mean "slow down" rather than "this item is bad"
+THROTTLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Budgets of the hosts this app talks to, anything else gets DEFAULT_LIMITS.
+# rate is requests per second, burst how many may start back to back.
+DEFAULT_LIMITS = {"concurrency": 4, "rate": 4.0, "burst": 4}
+HOST_LIMITS = {
+    "www.jobbank.gc.ca": {"concurrency": 8, "rate": 8.0, "burst": 8},
+    "smtp.gmail.com": {"concurrency": 1, "rate": 1.0, "burst": 5},
+}
+
+
+class CircuitOpen(Exception):
+    # Raised instead of waiting once a host has failed past the breaker's patience
+
+    def __init__(self, host):
+        super().__init__(f"{host} paused after repeated failures")
+        self.host = host
+
+
+def status_outcome(status):
+    return THROTTLED if status in THROTTLE_STATUSES else OK
+
+
+def smtp_outcome(code):
+    # 4xx replies are transient (rate limits, greylisting), 5xx only concern the message
+    return THROTTLED if 400 <= code < 500 else OK
+
+
+def retry_after_seconds(value):
+    # Retry-After in seconds; the HTTP-date form is rare enough to fall back on our own backoff
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class Host:
+    # Budget and health of one host: a token bucket for the rate, a cap on requests in flight,
+    # a pause after throttling and a circuit breaker over consecutive failures
+
+    def __init__(self, concurrency, rate, burst):
+        self.configure(concurrency, rate, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.backoff = 0.0
+        self.failures = 0
+        self.trips = 0
+        self.open_until = 0.0
+        self.probing = False
+
+    def configure(self, concurrency, rate, burst):
+        self.concurrency = max(1, int(concurrency))
+        self.max_rate = max(0.01, float(rate))
+        self.rate = self.max_rate
+        self.burst = max(1, int(burst))
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def half_open(self, now):
+        return self.trips > 0 and now >= self.open_until
+
+    def wait_time(self, now):
+        # Seconds until a slot could be free, 0 when one is free now, None when only a release frees one
+        until = max(self.paused_until, self.open_until) - now
+        if until > 0:
+            return until
+        if self.in_flight >= self.concurrency or (self.half_open(now) and self.probing):
+            return None
+        self.refill(now)
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class HostScheduler:
+    # Shared per-host budget for the crawlers, the posting fetches, the browsers and the mailer.
+    # Callers hold a slot for each request and report how it went: throttling halves the host's
+    # rate and pauses it (Retry-After or a doubling backoff), successes win the rate back step
+    # by step. `failure_threshold` consecutive failures open the circuit for `cooldown` seconds,
+    # doubled on every trip; one probe request then decides whether it closes. After `max_trips`
+    # trips in a row the host counts as down: it stays open for `max_cooldown` with slots failing
+    # at once with CircuitOpen, then gets a probe again like any other open circuit.
+
+    def __init__(self, limits=None, default_limits=None, failure_threshold=5, cooldown=30, max_cooldown=300,
+                 max_trips=3, max_backoff=60, recovery=0.05):
+        self.limits = {host: dict(value) for host, value in (limits or HOST_LIMITS).items()}
+        self.default_limits = dict(default_limits or DEFAULT_LIMITS)
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.max_trips = max_trips
+        self.max_backoff = max_backoff
+        self.recovery = recovery
+        self.hosts = {}
+        self.condition = threading.Condition()
+
+    def configure(self, host, **limits):
+        # Override concurrency, rate or burst of one host, for this and later requests
+        with self.condition:
+            merged = {**self.default_limits, **self.limits.get(host, {}), **limits}
+            self.limits[host] = merged
+            if host in self.hosts:
+                self.hosts[host].configure(merged["concurrency"], merged["rate"], merged["burst"])
+            self.condition.notify_all()
+
+    def host(self, host):
+        entry = self.hosts.get(host)
+        if entry is None:
+            limits = {**self.default_limits, **self.limits.get(host, {})}
+            entry = self.hosts[host] = Host(limits["concurrency"], limits["rate"], limits["burst"])
+        return entry
+
+    def acquire(self, host):
+        with self.condition:
+            entry = self.host(host)
+            while True:
+                now = time.monotonic()
+                if entry.trips > self.max_trips and now < entry.open_until:
+                    raise CircuitOpen(host)
+                wait = entry.wait_time(now)
+                if wait == 0:
+                    entry.tokens -= 1
+                    entry.in_flight += 1
+                    if entry.half_open(now):
+                        entry.probing = True
+                    return
+                self.condition.wait(wait)
+
+    def release(self, host, outcome=OK, retry_after=None):
+        with self.condition:
+            entry = self.host(host)
+            now = time.monotonic()
+            entry.in_flight -= 1
+            probe = entry.probing
+            entry.probing = False
+            if outcome == OK:
+                entry.failures = 0
+                entry.trips = 0
+                entry.open_until = 0.0
+                entry.backoff = 0.0
+                entry.rate = min(entry.max_rate, entry.rate + entry.max_rate * self.recovery)
+            else:
+                entry.failures += 1
+                if outcome == THROTTLED:
+                    entry.refill(now)
+                    entry.rate = max(entry.max_rate / 16, entry.rate / 2)
+                    entry.backoff = min(self.max_backoff, max(1.0, entry.backoff * 2))
+                    pause = retry_after if retry_after is not None else entry.backoff
+                    entry.paused_until = max(entry.paused_until, now + min(self.max_backoff, pause))
+                if probe or entry.failures >= self.failure_threshold:
+                    entry.trips += 1
+                    entry.failures = 0
+                    if entry.trips > self.max_trips:
+                        entry.open_until = now + self.max_cooldown
+                    else:
+                        entry.open_until = now + min(self.max_cooldown, self.cooldown * 2 ** (entry.trips - 1))
+            self.condition.notify_all()
+
+    @contextmanager
+    def slot(self, host, metrics=no_metrics):
+        # with scheduler.slot(host) as slot: ... slot.report(THROTTLED, retry_after)
+        # Leaving by an exception counts as FAILED unless an outcome was reported first.
+        with metrics.timer("scheduler_wait"):
+            try:
+                self.acquire(host)
+            except CircuitOpen:
+                metrics.count("circuit_open")
+                raise
+        slot = Slot()
+        try:
+            yield slot
+        except Exception:
+            slot.outcome = slot.outcome or FAILED
+            raise
+        finally:
+            if slot.outcome == THROTTLED:
+                metrics.count("throttled")
+            self.release(host, slot.outcome or OK, slot.retry_after)
+
+    def state(self, host):
+        with self.condition:
+            entry = self.host(host)
+            return {"rate": round(entry.rate, 3), "in_flight": entry.in_flight, "trips": entry.trips,
+                    "paused": max(entry.paused_until, entry.open_until) > time.monotonic()}
+
+
+class Slot:
+    # Outcome of one request, reported back to the scheduler when the slot is released
+
+    def __init__(self):
+        self.outcome = None
+        self.retry_after = None
+
+    def report(self, outcome, retry_after=None):
+        self.outcome = outcome
+        self.retry_after = retry_after
+
+
+# Shared by every scraper and mailer in the process so concurrent jobs split one budget per host
+default_scheduler = HostScheduler()
@@ -0,0 +1,227 @@
+from bs4 import BeautifulSoup
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
+import asyncio
+import time
+from dedup import DedupIndex, unique_jobs, posting_id, search_kind
+from driver_pool import warm_drivers
+from posting_http import PARSER, request
+from scheduler import default_scheduler
+from wait_policy import default_policy, articles_loaded
+from metrics import no_metrics
+
+LOGIN_URL = "https://www.jobbank.gc.ca/login"
+
+# The "more results" button fetches this fragment with the search query and a page number
+LOADER_PATH = "/jobsearch/job_search_loader.xhtml"
+
+
+# Collects the (title, href) pairs of the articles from arguments[1] on in one round-trip instead
+# of one WebDriver call per element, and returns them with the article count. With arguments[2]
+# set it also empties those articles: the empty <article> shells keep the count the "more" button
+# and articles_loaded go by, while the browser no longer holds every result loaded so far.
+EXTRACT_SCRIPT = """
+var login = arguments[0];
+var start = arguments[1];
+var empty = arguments[2];
+var rows = [];
+var articles = document.getElementsByTagName('article');
+for (var i = start; i < articles.length; i++) {
+    var spans = articles[i].getElementsByClassName('noctitle');
+    var links = articles[i].getElementsByTagName('a');
+    for (var j = 0; j < spans.length; j++) {
+        var title = spans[j].innerText.trim();
+        for (var k = 0; k < links.length; k++) {
+            var href = links[k].href;
+            if (href && href.indexOf(login) === -1) {
+                rows.push([title, href]);
+            }
+        }
+    }
+    if (empty) {
+        articles[i].textContent = '';
+    }
+}
+return [articles.length, rows];
+"""
+
+
+def extract_jobs(driver, start=0, empty=False):
+    # (article count, rows) for the articles from `start` on.
+    # Every link of an article is emitted once per title span, keep one row per posting.
+    count, pairs = driver.execute_script(EXTRACT_SCRIPT, LOGIN_URL, start, empty)
+    return count, unique_jobs({"Title": title, "Link": href} for title, href in pairs)
+
+
+def run_scraper(url, on_status=None, drivers=warm_drivers, policy=default_policy, max_stalls=3, known=None,
+                metrics=no_metrics, on_rows=None, scheduler=default_scheduler):
+    # Load the search result by clicking #morepage. The articles each click appends are
+    # extracted and emptied right away, so the page stays small however long the result is.
+    # on_status(message, progress) reports progress, on_rows(rows) gets each batch of new rows.
+    # With `known` posting ids, loading stops at the first batch that holds one of them.
+    from selenium.webdriver.common.by import By
+    from selenium.common.exceptions import NoSuchElementException, TimeoutException
+    site = urlsplit(url).netloc
+    data = []
+    seen = set()
+    state = {"offset": 0}
+
+    def take():
+        with metrics.timer("extract"):
+            state["offset"], rows = extract_jobs(driver, state["offset"], empty=True)
+        rows = [row for row in rows if row["Link"] not in seen]
+        seen.update(row["Link"] for row in rows)
+        data.extend(rows)
+        if on_rows and rows:
+            on_rows(rows)
+        return rows
+
+    with metrics.timer("driver_start"):
+        driver = drivers.acquire()
+    try:
+        with scheduler.slot(site, metrics), metrics.timer("page_load"):
+            driver.get(url)
+        click_count = 0
+        stalls = 0
+        while True:
+            rows = take()
+            if known and any(posting_id(row["Link"]) in known for row in rows):
+                break
+            try:
+                morepage_div = driver.find_element(By.ID, "morepage")
+                button = morepage_div.find_element(By.TAG_NAME, "button")
+            except NoSuchElementException:
+                break
+
+            # Each click is one request to the site. Wait for the new articles instead of
+            # sleeping, give up after repeated stalls. A stall is a slow page rather than a
+            # failing host, so it does not count toward the host's breaker
+            with scheduler.slot(site, metrics):
+                button.click()
+                try:
+                    with metrics.timer("wait_morepage"):
+                        policy.wait(driver, articles_loaded(state["offset"]), "morepage", site)
+                    stalled = False
+                except TimeoutException:
+                    stalled = True
+            if stalled:
+                metrics.count("wait_timeouts")
+                stalls += 1
+                if stalls >= max_stalls:
+                    break
+                continue
+            stalls = 0
+
+            click_count += 1
+            if on_status:
+                on_status(f"Loaded {click_count} more pages ({len(data)} jobs)...", click_count / (click_count + 8))
+
+        # Articles that arrived after the last wait gave up
+        take()
+        return data
+    finally:
+        drivers.release(driver)
+
+
+def parse_search_results(html, base_url):
+    # Same rows run_scraper extracts, from one page or fragment of search results
+    soup = BeautifulSoup(html, PARSER)
+    data = []
+    articles = soup.find_all("article")
+    for article in articles:
+        for span in article.select(".noctitle"):
+            title = span.get_text(" ", strip=True)
+            for link in article.find_all("a", href=True):
+                href = urljoin(base_url, link["href"])
+                if LOGIN_URL not in href:
+                    data.append({"Title": title, "Link": href})
+    return articles, unique_jobs(data)
+
+
+def page_url(search_url, page):
+    # Page 1 is the search itself, later pages come from the loader fragment
+    if page == 1:
+        return search_url
+    parts = urlsplit(search_url)
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True) if key != "page"]
+    query.append(("page", str(page)))
+    return urlunsplit((parts.scheme, parts.netloc, LOADER_PATH, urlencode(query), ""))
+
+
+def fetch_page(url, timeout=15, scheduler=default_scheduler, metrics=no_metrics):
+    return request("GET", url, scheduler, metrics, timeout=timeout).text
+
+
+async def crawl_search(search_url, concurrency=4, on_page=None, max_pages=1000, known=None, metrics=no_metrics,
+                       on_rows=None, scheduler=default_scheduler):
+    # Fetch result pages directly, at most `concurrency` requests in flight and within the
+    # host's budget in `scheduler`.
+    # on_page(page, rows) is called as each page arrives and on_rows(rows) with its rows not
+    # seen on an earlier page; the crawl ends at the first empty page, or at the first page
+    # holding one of the `known` posting ids.
+    semaphore = asyncio.Semaphore(concurrency)
+    pages = {}
+    seen = set()
+    state = {"next": 1, "last": max_pages}
+
+    async def worker():
+        while True:
+            page = state["next"]
+            if page > state["last"]:
+                return
+            state["next"] += 1
+
+            url = page_url(search_url, page)
+            async with semaphore:
+                started = time.perf_counter()
+                html = await asyncio.to_thread(fetch_page, url, scheduler=scheduler, metrics=metrics)
+                metrics.record("page_fetch", time.perf_counter() - started)
+            with metrics.timer("parse"):
+                articles, rows = parse_search_results(html, url)
+            if not articles:
+                state["last"] = min(state["last"], page - 1)
+                continue
+            pages[page] = rows
+            if known and any(posting_id(row["Link"]) in known for row in rows):
+                state["last"] = min(state["last"], page)
+            if on_page:
+                on_page(page, rows)
+            if on_rows:
+                fresh = [row for row in rows if row["Link"] not in seen]
+                seen.update(row["Link"] for row in fresh)
+                if fresh:
+                    on_rows(fresh)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    data = []
+    for page in sorted(pages):
+        if page <= state["last"]:
+            data.extend(pages[page])
+    return unique_jobs(data)
+
+
+def run_crawler(search_url, concurrency=4, on_page=None, known=None, metrics=no_metrics, on_rows=None,
+                scheduler=default_scheduler):
+    return asyncio.run(crawl_search(search_url, concurrency=concurrency, on_page=on_page, known=known, metrics=metrics,
+                                    on_rows=on_rows, scheduler=scheduler))
+
+
+def new_postings(url, scrape=run_scraper, index=None, **kwargs):
+    # Incremental mode for run_scraper or run_crawler: remembers the posting ids each search URL
+    # returned and only gives back the ones it has not returned before. Job Bank lists the
+    # newest postings first, so pagination can stop at the first known one.
+    own_index = index is None
+    if own_index:
+        index = DedupIndex()
+    try:
+        kind = search_kind(url)
+        known = index.keys(kind)
+        if kwargs.get("on_rows"):
+            on_rows = kwargs["on_rows"]
+            kwargs["on_rows"] = lambda rows: on_rows([row for row in rows if posting_id(row["Link"]) not in known])
+        rows = [row for row in scrape(url, known=known, **kwargs) if posting_id(row["Link"]) not in known]
+        index.add(kind, [posting_id(row["Link"]) for row in rows if posting_id(row["Link"])])
+        return rows
+    finally:
+        if own_index:
+            index.close()
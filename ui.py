@@ -0,0 +1,99 @@
+import streamlit as st
+from collections import Counter
+import json
+import time
+import pandas as pd
+from frame_cache import FrameCache
+from job_queue import JobQueue, QUEUED, RUNNING
+from worker import Worker
+
+
+# Rows a live table keeps, and failures the error log shows; the rest stays in the files
+LIVE_ROWS = 500
+ERROR_LOG_ROWS = 200
+
+
+@st.cache_resource
+def get_worker():
+    # One background worker per Streamlit server, shared by every session and tab
+    return Worker()
+
+
+@st.cache_resource
+def get_frame_cache():
+    # Parsed uploads and result downloads shared by every rerun of every session
+    return FrameCache()
+
+
+def show_metrics(report, key):
+    # Per-stage timings of a run (p50/p95, items/sec) with the raw report as a JSON download
+    if not report or not report["stages"]:
+        return
+    with st.expander(f"Timing breakdown ({report['elapsed']:.1f}s)"):
+        st.dataframe(pd.DataFrame.from_dict(report["stages"], orient="index"))
+        if report["counters"]:
+            st.write(report["counters"])
+        st.download_button(
+            label="Download timings (JSON)",
+            data=json.dumps(report, indent=2),
+            file_name="timings.json",
+            mime="application/json",
+            key=key,
+        )
+
+
+def error_kind(error):
+    # "TimeoutException: Message: ..." -> "TimeoutException"
+    text = str(error or "Unknown error").strip().splitlines()[0]
+    return text.split(":")[0][:80]
+
+
+def show_errors(failures):
+    # Failed items as one line of counts per kind, the latest messages in a collapsed log,
+    # instead of one element per failure
+    if not failures:
+        return
+    counts = Counter(error_kind(error) for _, error in failures)
+    st.warning(f"{len(failures)} failed | " + " | ".join(f"{kind}: {count}" for kind, count in counts.most_common()))
+    with st.expander(f"Error log (latest {min(len(failures), ERROR_LOG_ROWS)})"):
+        st.dataframe(pd.DataFrame(failures[-ERROR_LOG_ROWS:], columns=["Item", "Error"]), hide_index=True)
+
+
+def show_job_errors(job):
+    queue = JobQueue()
+    try:
+        failures = queue.failures(job["run_id"])
+    finally:
+        queue.close()
+    show_errors(failures)
+
+
+def show_job(job_id, poll_interval=1.0, on_poll=None):
+    # Progress of a background job, the page reruns itself until the job has finished.
+    # The worker owns the browsers and the SMTP connection, the pages only submit jobs and poll
+    # them here. What a page builds from a finished job (frames, downloads) goes in the frame
+    # cache under the job id, so reruns reuse it instead of rebuilding it.
+    # on_poll(job) draws whatever the page shows of a job still running, before each rerun
+    queue = JobQueue()
+    try:
+        job = queue.get_job(job_id)
+    finally:
+        queue.close()
+    if job is None:
+        return None
+
+    st.progress(min(1.0, job["done"] / job["total"]) if job["total"] else 0.0)
+    st.text(job["message"] or job["state"].capitalize() + "...")
+    if job["error"]:
+        st.error(f"An error occurred: {job['error']}")
+    show_metrics(job["metrics"], key=f"metrics-{job_id}")
+
+    if job["state"] in (QUEUED, RUNNING):
+        if not get_worker().alive():
+            st.warning("The background worker stopped. Submit the file again to resume where it left off.")
+            return job
+        if on_poll:
+            on_poll(job)
+        time.sleep(poll_interval)
+        st.rerun()
+    return job
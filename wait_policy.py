@@ -0,0 +1,87 @@
+from collections import deque
+import math
+import threading
+import time
+
+
+# DOM conditions the scrapers wait on instead of fixed sleeps
+
+def article_count(driver):
+    return driver.execute_script("return document.getElementsByTagName('article').length;")
+
+
+def articles_loaded(previous_count):
+    # More articles were appended, or the "more" button went away because there is nothing left
+    def condition(driver):
+        from selenium.webdriver.common.by import By
+        if article_count(driver) > previous_count:
+            return True
+        return not driver.find_elements(By.ID, "morepage")
+    return condition
+
+
+def howtoapply_populated(driver):
+    from selenium.webdriver.common.by import By
+    from selenium.common.exceptions import NoSuchElementException
+    try:
+        element = driver.find_element(By.ID, "howtoapply")
+    except NoSuchElementException:
+        return False
+    return element if element.text.strip() else False
+
+
+class WaitPolicy:
+    # Waits on a condition with a timeout tuned per (site, condition) from observed latencies.
+    # Once enough samples exist the timeout is the p99 of recent waits times `margin`,
+    # clamped to [min_timeout, max_timeout]. Timeouts count as samples so a slowing site
+    # raises its own limit instead of failing forever.
+
+    def __init__(self, default_timeout=10, min_timeout=2, max_timeout=30, margin=1.5,
+                 window=200, min_samples=20, site_timeouts=None):
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.margin = margin
+        self.window = window
+        self.min_samples = min_samples
+        self.site_timeouts = dict(site_timeouts or {})
+        self.latencies = {}
+        self.lock = threading.Lock()
+
+    def record(self, site, name, seconds):
+        with self.lock:
+            samples = self.latencies.setdefault((site, name), deque(maxlen=self.window))
+            samples.append(seconds)
+
+    def percentile(self, site, name, q=0.99):
+        with self.lock:
+            samples = sorted(self.latencies.get((site, name), ()))
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, math.ceil(q * len(samples)) - 1)]
+
+    def timeout(self, site, name):
+        base = self.site_timeouts.get(site, self.default_timeout)
+        with self.lock:
+            count = len(self.latencies.get((site, name), ()))
+        if count < self.min_samples:
+            return base
+        p99 = self.percentile(site, name)
+        return min(self.max_timeout, max(self.min_timeout, p99 * self.margin))
+
+    def wait(self, driver, condition, name, site=None):
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.common.exceptions import TimeoutException
+        timeout = self.timeout(site, name)
+        start = time.monotonic()
+        try:
+            result = WebDriverWait(driver, timeout, poll_frequency=0.1).until(condition)
+        except TimeoutException:
+            self.record(site, name, timeout)
+            raise
+        self.record(site, name, time.monotonic() - start)
+        return result
+
+
+# Shared by the search and posting scrapers so both tune from the same observations
+default_policy = WaitPolicy()
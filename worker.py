@@ -0,0 +1,364 @@
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import multiprocessing
+import os
+import threading
+import traceback
+import uuid
+import pandas as pd
+from classify import classify_contacts, first_email, EN, FR, BOTH
+from dedup import DedupIndex, canonical_url
+from ingest import iter_chunks, estimate_rows, ResultWriter
+from job_queue import JobQueue, DONE, FAILED, SKIPPED
+from mailer import Mailer, MessageTemplate, PreparedAttachment
+from metrics import Metrics
+from posting_cache import PostingCache
+from driver_pool import warm_drivers
+from posting_scraper import scrape_postings
+from search_scraper import run_scraper, run_crawler, new_postings
+from scheduler import default_scheduler, CircuitOpen
+
+UPLOAD_DIR = "uploads"
+
+# Sends between two timing reports written to the job, building one sorts every sample
+METRICS_EVERY = 50
+
+# Append-only result files
+SEARCH_RESULTS_FILE = "search_results.csv"
+SCRAPED_RESULTS_FILE = "scraped_results.csv"
+SENT_LOG_FILE = "sent_emails.csv"
+
+
+def save_upload(upload):
+    # The worker runs in another process, so uploads are handed over as files named by content
+    data = upload.getvalue()
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(UPLOAD_DIR, f"{hashlib.sha1(data).hexdigest()[:16]}-{os.path.basename(upload.name)}")
+    if not os.path.exists(path):
+        with open(path, "wb") as f:
+            f.write(data)
+    return path
+
+
+def search_jobs(job_id, run_id, params, queue, metrics, on_rows=None):
+    # page_1: the job links of one search, by the browser click loop or the HTTP crawler.
+    # Rows land in the queue as they are extracted so the page can show them while it runs;
+    # once the search is over they are replaced by its final, deduplicated result.
+    url = params["url"]
+    streamed = {"rows": 0}
+
+    def stream_rows(rows):
+        queue.record_results(run_id, rows, start=streamed["rows"])
+        streamed["rows"] += len(rows)
+        results.write_rows({**row, "Search": url} for row in rows)
+        if on_rows:
+            on_rows(rows)
+
+    def update_status(message, progress):
+        # The click loop does not know how many pages there are, progress only creeps up
+        queue.update_job(job_id, done=round((progress or 0) * 1000), total=1000, message=message)
+
+    loaded = {"pages": 0, "jobs": 0}
+
+    def update_page(page, rows):
+        loaded["pages"] += 1
+        loaded["jobs"] += len(rows)
+        update_status(f"Loaded {loaded['pages']} pages ({loaded['jobs']} jobs)...", loaded["pages"] / (loaded["pages"] + 8))
+
+    if params.get("engine") == "browser":
+        scrape, options = run_scraper, dict(on_status=update_status)
+    else:
+        scrape, options = run_crawler, dict(on_page=update_page)
+    options.update(metrics=metrics, on_rows=stream_rows)
+    with ResultWriter(SEARCH_RESULTS_FILE, ["Search", "Title", "Link"]) as results:
+        data = new_postings(url, scrape, **options) if params.get("incremental") else scrape(url, **options)
+    queue.reset(run_id)
+    queue.record_results(run_id, data)
+    queue.update_job(job_id, done=1000, total=1000,
+                     message=f"{'New' if params.get('incremental') else 'Total'} jobs scraped: {len(data)}")
+
+
+def scrape_emails(job_id, run_id, params, queue, metrics, on_rows=None):
+    # page_2: scrape every pending link of the uploaded file, chunk by chunk.
+    # on_rows(rows) gets each chunk's results as they are written.
+    path = params["path"]
+    if params.get("restart"):
+        queue.reset(run_id)
+    with open(path, "rb") as source:
+        total = estimate_rows(source, path)
+    counts = queue.counts(run_id)
+    scraped = {"done": counts[DONE] + counts[SKIPPED]}
+    queue.update_job(job_id, done=scraped["done"], total=total)
+
+    cache = PostingCache() if params.get("use_cache", True) else None
+    seen = DedupIndex()
+    # A run started over is meant to produce every row again, the cross-run skip does not apply
+    skip_seen = params.get("skip_seen", True) and not params.get("restart")
+    # First position of every canonical link, later rows with the same link are skipped
+    first_positions = {}
+    batch = []
+
+    def skip(position, reason):
+        metrics.count("skipped")
+        queue.mark_skipped(run_id, position, reason)
+        scraped["done"] += 1
+        queue.update_job(job_id, done=scraped["done"], message=f"Progress: {scraped['done']}/{total}")
+
+    def update_progress(done, chunk_total, index, row, error, warnings):
+        position, (title, link) = batch[index]
+        if error is not None:
+            # Prefixed with the exception type so the page can count failures by kind
+            queue.mark_failed(run_id, position, f"{type(error).__name__}: {error}")
+        else:
+            queue.mark_done(run_id, position, row)
+            # Rows where the email could not be read stay out of the index, like they stay out
+            # of the cache, so later files fetch them again instead of skipping them
+            if not str(row["Email"]).startswith("Error"):
+                seen.add("url", [link])
+        scraped["done"] += 1
+        message = f"Progress: {scraped['done']}/{total}"
+        if cache is not None:
+            message += f" | {cache.stats()}"
+        queue.update_job(job_id, done=scraped["done"], message=message)
+
+    try:
+        with open(path, "rb") as source, \
+                ResultWriter(SCRAPED_RESULTS_FILE, ["Title", "Link", "Qualification", "Email", "Method"]) as results:
+            offset = 0
+            for chunk in metrics.iterate(iter_chunks(source, path), "read_file"):
+                links = [canonical_url(link) for link in chunk['Link']]
+                for position, link in enumerate(links, start=offset):
+                    first_positions.setdefault(link, position)
+                queue.enqueue(run_id, ((link, {"Title": title}) for title, link in zip(chunk['Title'], links)), start=offset)
+
+                # Duplicates are dropped here, before a session or a browser is spent on them
+                batch = []
+                for position, link, payload in queue.pending(run_id, offset, offset + len(chunk)):
+                    if first_positions[link] != position:
+                        skip(position, f"Duplicate of row {first_positions[link] + 1}")
+                    elif skip_seen and seen.contains("url", link) and not (cache is not None and cache.fresh(link)):
+                        # Postings with a fresh cache entry cost nothing, they are served from it
+                        skip(position, "Already scraped in an earlier run")
+                    else:
+                        batch.append((position, (payload["Title"], link)))
+                offset += len(chunk)
+                with metrics.timer("scrape_chunk", len(batch)):
+                    rows = scrape_postings([row for _, row in batch], workers=params.get("workers", 4),
+                                           on_progress=update_progress, cache=cache, metrics=metrics)
+                with metrics.timer("write_results", len(rows)):
+                    results.write_rows(rows)
+                if on_rows and rows:
+                    on_rows(rows)
+                queue.update_job(job_id, metrics=metrics.to_json())
+    finally:
+        seen.close()
+        if cache is not None:
+            cache.close()
+
+
+def send_emails(job_id, run_id, params, queue, metrics, on_rows=None):
+    # page_3: send the next `limit` pending recipients (all of them without a limit) over one
+    # SMTP connection, paced by the server's budget in the scheduler.
+    # on_rows([row]) gets each delivery result as it is logged.
+    path = params["path"]
+    if params.get("restart"):
+        queue.reset(run_id)
+    # First position of every normalized address, later rows with the same address are skipped
+    first_positions = {}
+    with open(path, "rb") as source:
+        offset = 0
+        for chunk in metrics.iterate(iter_chunks(source, path), "read_file"):
+            # Language and normalized email are worked out for the whole chunk at once
+            with metrics.timer("classify", len(chunk)):
+                chunk = classify_contacts(chunk)
+            for position, email in enumerate(chunk["Email"], start=offset):
+                first_positions.setdefault(email, position)
+            queue.enqueue(run_id, (
+                (email, {"Qualification": qualification, "Language": language})
+                for qualification, email, language in zip(chunk["Qualification"], chunk["Email"], chunk["Language"])
+            ), start=offset)
+            offset += len(chunk)
+
+    to_send = queue.pending(run_id, limit=params.get("limit") or None)
+    queue.update_job(job_id, done=0, total=len(to_send))
+    if not to_send:
+        queue.update_job(job_id, message="No more emails to send!")
+        return
+
+    def attachment(name):
+        if params.get(name) is None:
+            return None
+        attach_name, attach_path = params[name]
+        with open(attach_path, "rb") as f:
+            return PreparedAttachment(attach_name, f.read())
+
+    # Subject, body and encoded attachment are built once per language
+    sender_email = params["sender_email"]
+    en_template = MessageTemplate(sender_email, params["en_subject"], params["en_message"], attachment("en_attach"))
+    fr_template = MessageTemplate(sender_email, params["fr_subject"], params["fr_message"], attachment("fr_attach"))
+    templates = {
+        EN: en_template,
+        FR: fr_template,
+        BOTH: en_template,
+    }
+
+    seen = DedupIndex()
+    skip_seen = params.get("skip_seen", True)
+    try:
+        with Mailer(params["smtp_server"], params["smtp_port"], sender_email, params["sender_password"],
+                    use_tls=params.get("use_tls", True), metrics=metrics) as mailer, \
+                ResultWriter(SENT_LOG_FILE, ["Email", "Qualification", "Status", "Error", "Time"]) as sent_log:
+            for count, (position, recipient_email, contact) in enumerate(to_send):
+                qualification = contact["Qualification"]
+                template = templates.get(contact["Language"])
+                if first_email(str(recipient_email)) is None:
+                    metrics.count("skipped")
+                    queue.mark_skipped(run_id, position, "No email address")
+                    queue.update_job(job_id, done=count + 1, message=f"Skipped '{recipient_email}': no email address")
+                    continue
+                if first_positions.get(recipient_email, position) != position:
+                    metrics.count("skipped")
+                    queue.mark_skipped(run_id, position, f"Duplicate of row {first_positions[recipient_email] + 1}")
+                    queue.update_job(job_id, done=count + 1, message=f"Skipped {recipient_email}: duplicate address")
+                    continue
+                if skip_seen and seen.contains("email", recipient_email):
+                    metrics.count("skipped")
+                    queue.mark_skipped(run_id, position, "Already emailed in an earlier run")
+                    queue.update_job(job_id, done=count + 1, message=f"Skipped {recipient_email}: already emailed")
+                    continue
+                if template is None:
+                    metrics.count("skipped")
+                    queue.mark_skipped(run_id, position, f"Unknown qualification '{qualification}'")
+                    queue.update_job(job_id, done=count + 1, message=f"Skipped {recipient_email}: unknown qualification '{qualification}'")
+                    continue
+
+                with metrics.timer("render"):
+                    message = template.render(recipient_email)
+                # A connection or login failure raises ConnectionFailed and fails the job,
+                # the recipients not reached yet stay pending
+                try:
+                    delivered, error = mailer.send(recipient_email, message)
+                except CircuitOpen as e:
+                    # The rest stays pending for the next run instead of failing one by one
+                    queue.update_job(job_id, message=f"Stopped after {count} of {len(to_send)}: {e}")
+                    break
+                metrics.count("sent" if delivered else "failed")
+                logged = [{
+                    "Email": recipient_email,
+                    "Qualification": qualification,
+                    "Status": "sent" if delivered else "failed",
+                    "Error": error or "",
+                    "Time": pd.Timestamp.now().isoformat(timespec="seconds"),
+                }]
+                sent_log.write_rows(logged)
+                if on_rows:
+                    on_rows(logged)
+                if delivered:
+                    queue.mark_done(run_id, position)
+                    seen.add("email", [recipient_email])
+                else:
+                    queue.mark_failed(run_id, position, error)
+                queue.update_job(job_id, done=count + 1, message=f"Sending email {count + 1} of {len(to_send)}: {recipient_email}",
+                                 metrics=metrics.to_json() if (count + 1) % METRICS_EVERY == 0 else None)
+    finally:
+        seen.close()
+
+
+HANDLERS = {
+    "search": search_jobs,
+    "scrape": scrape_emails,
+    "send": send_emails,
+}
+
+
+def run_job(job_id, kind, run_id, params, on_rows=None):
+    queue = JobQueue()
+    # Per-stage timings of this run, published with the job so the UI can show them
+    metrics = Metrics()
+    try:
+        # Two jobs on the same run would hand out the same pending items twice
+        if not queue.claim_run(job_id, run_id):
+            queue.update_job(job_id, state=FAILED, error="Another job is already running this file")
+            return
+        # Per-host budgets chosen on the page or the command line, shared by every job of this process
+        for host, limits in (params.get("host_limits") or {}).items():
+            default_scheduler.configure(host, **limits)
+        HANDLERS[kind](job_id, run_id, params, queue, metrics, on_rows=on_rows)
+        queue.update_job(job_id, state=DONE, metrics=metrics.to_json())
+    except Exception as e:
+        traceback.print_exc()
+        queue.update_job(job_id, state=FAILED, error=str(e), metrics=metrics.to_json())
+    finally:
+        queue.close()
+
+
+def serve(inbox, max_jobs=2, warm_browsers=2):
+    # Worker process main loop, runs up to max_jobs submitted jobs at a time. Browsers stay
+    # warm between jobs; atexit does not run in a multiprocessing child, so they are closed here.
+    if warm_browsers:
+        warm_drivers.prewarm(warm_browsers)
+    try:
+        with ThreadPoolExecutor(max_workers=max_jobs) as executor:
+            while True:
+                job = inbox.get()
+                if job is None:
+                    return
+                executor.submit(run_job, *job)
+    finally:
+        warm_drivers.close()
+
+
+class Worker:
+    # Background process that owns the browsers and SMTP connections. The UI submits jobs
+    # through the inbox and polls their progress in the job queue database, so a rerun or a
+    # second tab never blocks on a running scrape.
+
+    def __init__(self, max_jobs=2, warm_browsers=2):
+        self.max_jobs = max_jobs
+        self.warm_browsers = warm_browsers
+        self.context = multiprocessing.get_context("spawn")
+        self.inbox = self.context.Queue()
+        self.process = None
+        # Jobs handed to the current process, failed if it dies so they stop holding their run
+        self.jobs = set()
+        self.lock = threading.Lock()
+
+    def alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def ensure_running(self):
+        with self.lock:
+            if not self.alive():
+                if self.jobs:
+                    queue = JobQueue()
+                    try:
+                        queue.abandon(self.jobs, "The background worker stopped")
+                    finally:
+                        queue.close()
+                    self.jobs.clear()
+                self.process = self.context.Process(target=serve, args=(self.inbox, self.max_jobs, self.warm_browsers),
+                                                    daemon=True)
+                self.process.start()
+
+    def submit(self, kind, run_id, params):
+        # A second click or a second tab on a file that is already being worked on gets the
+        # job in progress back instead of a duplicate run
+        self.ensure_running()
+        job_id = uuid.uuid4().hex
+        queue = JobQueue()
+        try:
+            active = queue.active_job(run_id)
+            if active is not None:
+                return active
+            queue.create_job(job_id, kind, run_id)
+        finally:
+            queue.close()
+        with self.lock:
+            self.jobs.add(job_id)
+        self.inbox.put((job_id, kind, run_id, params))
+        return job_id
+
+    def stop(self):
+        if self.alive():
+            self.inbox.put(None)
+            self.process.join(timeout=10)